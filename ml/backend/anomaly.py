@@ -0,0 +1,154 @@
+"""
+Streaming Anomaly Detection over Daily Hub Metrics
+Keeps per-hub exponentially weighted statistics for cold-chain and wastage metrics and flags
+spikes as each new day arrives. State is a handful of (hubs x metrics) arrays, so a new day
+costs O(hubs) and history is never rescanned.
+"""
+
+from collections import deque
+
+from lazy import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+# Metric -> (which direction counts as anomalous, smallest deviation treated as normal noise).
+# The floor keeps near-constant series (e.g. hubs that never lose power) from scoring every
+# small change as an extreme outlier.
+WATCHED_METRICS = {
+    'wasted_quantity': ('high', 2.0),
+    'wastage_rate': ('high', 1.0),
+    'power_outage_hours': ('high', 0.5),
+    'temperature_avg': ('both', 0.5),
+    'humidity_avg': ('both', 2.0),
+}
+
+# Mean absolute deviation -> standard deviation for normally distributed data (sqrt(pi / 2))
+MAD_TO_STD = 1.2533
+
+class AnomalyDetector:
+    """Robust EWMA z-score detector, vectorized across all hubs at once.
+
+    For each hub and metric it tracks an exponentially weighted mean and mean absolute
+    deviation. A day's value scores (value - mean) / (1.2533 * deviation); scores beyond
+    `threshold` after `warmup` days are flagged. After warm-up, values are clipped to the
+    threshold band before updating the statistics so a spike doesn't mask the next one.
+    """
+
+    def __init__(self, metrics=None, alpha=0.1, threshold=3.5, warmup=7, max_alerts=1000):
+        self.metrics = dict(metrics or WATCHED_METRICS)
+        self.columns = list(self.metrics)
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.hubs = {}
+        self.hub_names = {}
+        self.mean = np.zeros((0, len(self.columns)))
+        self.deviation = np.zeros((0, len(self.columns)))
+        self.observations = np.zeros(0, dtype=np.int64)
+        self.last_day = np.zeros(0, dtype='datetime64[D]')
+        self.alerts = deque(maxlen=max_alerts)
+        self.latest_day = None
+        self._high_only = np.array([self.metrics[c][0] == 'high' for c in self.columns])
+        self._min_scale = np.array([self.metrics[c][1] for c in self.columns], dtype=np.float64)
+
+    def _rows(self, hub_ids):
+        new = [hub for hub in pd.unique(hub_ids) if hub not in self.hubs]
+        if new:
+            for hub in new:
+                self.hubs[hub] = len(self.hubs)
+            grow = len(new)
+            self.mean = np.vstack([self.mean, np.zeros((grow, len(self.columns)))])
+            self.deviation = np.vstack([self.deviation, np.zeros((grow, len(self.columns)))])
+            self.observations = np.concatenate([self.observations, np.zeros(grow, dtype=np.int64)])
+            self.last_day = np.concatenate([self.last_day, np.full(grow, np.datetime64('NaT'), dtype='datetime64[D]')])
+        return np.array([self.hubs[hub] for hub in hub_ids], dtype=np.int64)
+
+    def update_day(self, day, frame):
+        """Score and absorb one day's metrics (at most one row per hub). Returns the new alerts."""
+        day = np.datetime64(pd.Timestamp(day).date(), 'D')
+        frame = frame.drop_duplicates('hub_id', keep='last')
+        rows = self._rows(frame['hub_id'].to_numpy())
+        if 'hub_name' in frame:
+            self.hub_names.update(zip(frame['hub_id'], frame['hub_name']))
+
+        # Each hub absorbs a given day only once, so re-sent or late history is ignored
+        fresh = np.isnat(self.last_day[rows]) | (self.last_day[rows] < day)
+        rows = rows[fresh]
+        # A metric missing from the batch counts as not reported (NaN), like a missing value
+        values = frame.reindex(columns=self.columns).to_numpy(dtype=np.float64)[fresh]
+        if len(rows) == 0:
+            return []
+
+        mean, deviation = self.mean[rows], self.deviation[rows]
+        observations = self.observations[rows]
+        # The deviation starts at zero, so correct its start-up bias before using it as a scale
+        seen = np.maximum(observations - 1, 1)[:, None]
+        corrected = deviation / (1 - (1 - self.alpha) ** seen)
+        scale = np.maximum(MAD_TO_STD * corrected, self._min_scale)
+        scores = (values - mean) / scale
+        first = observations == 0
+        scores[first] = 0.0
+        directional = np.where(self._high_only, scores, np.abs(scores))
+        warmed = (observations >= self.warmup)[:, None]
+        flagged = warmed & (directional > self.threshold) & ~np.isnan(values)
+
+        # Robust update: once warmed up, clip to the threshold band so spikes don't inflate the baseline
+        band = self.threshold * scale
+        clipped = np.where(warmed, np.clip(values, mean - band, mean + band), values)
+        clipped = np.where(np.isnan(clipped), mean, clipped)
+        new_mean = np.where(first[:, None], clipped, mean + self.alpha * (clipped - mean))
+        new_deviation = np.where(first[:, None], 0.0,
+                                 (1 - self.alpha) * deviation + self.alpha * np.abs(clipped - mean))
+        self.mean[rows], self.deviation[rows] = new_mean, new_deviation
+        self.observations[rows] += 1
+        self.last_day[rows] = day
+        if self.latest_day is None or day > self.latest_day:
+            self.latest_day = day
+
+        alerts = []
+        hub_ids = frame['hub_id'].to_numpy()[fresh]
+        for r, c in zip(*np.nonzero(flagged)):
+            hub_id = hub_ids[r]
+            alerts.append({
+                'hub_id': hub_id,
+                'hub_name': self.hub_names.get(hub_id),
+                'date': str(day),
+                'metric': self.columns[c],
+                'value': round(float(values[r, c]), 2),
+                'expected': round(float(mean[r, c]), 2),
+                'score': round(float(scores[r, c]), 2),
+                'severity': 'high' if abs(scores[r, c]) > 2 * self.threshold else 'medium',
+            })
+        self.alerts.extend(alerts)
+        return alerts
+
+    def update(self, metrics):
+        """Absorb a batch of daily_metrics rows, one day at a time in date order."""
+        alerts = []
+        dates = pd.to_datetime(metrics['date'])
+        for day, day_frame in metrics.groupby(dates, sort=True):
+            alerts += self.update_day(day, day_frame)
+        return alerts
+
+    def recent_alerts(self, hub_id=None, metric=None, since=None, limit=100):
+        alerts = [
+            alert for alert in reversed(self.alerts)
+            if (hub_id is None or alert['hub_id'] == hub_id)
+            and (metric is None or alert['metric'] == metric)
+            and (since is None or alert['date'] >= since)
+        ]
+        return alerts[:limit]
+
+    def baselines(self, hub_id):
+        """Current expected value and typical deviation per metric for one hub."""
+        row = self.hubs.get(hub_id)
+        if row is None:
+            return None
+        return {
+            column: {
+                'expected': round(float(self.mean[row, c]), 2),
+                'typical_deviation': round(float(max(MAD_TO_STD * self.deviation[row, c], self._min_scale[c])), 2),
+            }
+            for c, column in enumerate(self.columns)
+        }
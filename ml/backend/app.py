@@ -3,86 +3,789 @@ Flask Backend API for E-Vaccination Admin Dashboard
 Provides endpoints for vaccine movement, wastage prediction, visualizations, and insights
 """
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Blueprint, Flask, Response, current_app, jsonify, request, send_from_directory, stream_with_context
 from flask_cors import CORS
-import pandas as pd
-import numpy as np
+from contextlib import contextmanager
+from functools import wraps
+import hmac
 import pickle
-from datetime import datetime, timedelta
+from datetime import date, datetime, timezone
+import hashlib
+import json
 import os
+import threading
+import time
+
+from anomaly import AnomalyDetector
+from cache import ResultCache
+from compression import ResponseCompressor
+from events import EventBroker, diff_inventory, diff_insights, diff_movements, make_event
+from forecasting import FORECAST_HORIZONS, WastageForecaster
+from hub_summary import HubSummary
+from lazy import lazy_import
+from record_store import RecordStore
+from sketches import VaccinationSketch
+from slots import SharedBookings, SlotBook
+from snapshot import SnapshotStore
+from validation import SCHEMAS, QualityLog, validate
+
+# pandas/numpy are only imported when a handler first touches them, so
+# importing this module (health checks, tests, static files) stays cheap
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
 
 # Base paths (robust regardless of where script is launched)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, '..', 'data')
 MODELS_DIR = os.path.join(BASE_DIR, '..', 'models')
 FRONTEND_DIR = os.path.join(BASE_DIR, '..', 'frontend')
+MODEL_PATH = os.path.join(MODELS_DIR, 'wastage_prediction_model.pkl')
+VACCINATION_STORE_DIR = os.path.join(DATA_DIR, 'vaccination_store')
+
+# All routes live on this blueprint; create_app() registers it
+api = Blueprint('api', __name__)
+
+# Dataset name -> CSV file, and the column that uniquely identifies a row
+TABLE_FILES = {
+    'hubs': 'hubs_master.csv',
+    'inventory': 'vaccine_inventory.csv',
+    'movements': 'vaccine_movements.csv',
+    'vaccinations': 'vaccination_records.csv',
+    'wastage': 'wastage_tracking.csv',
+    'daily_metrics': 'daily_metrics.csv',
+    'demographics': 'demographics_summary.csv',
+}
+TABLE_KEYS = {
+    'hubs': 'hub_id',
+    'inventory': 'inventory_id',
+    'movements': 'transfer_id',
+    'vaccinations': 'vaccination_id',
+    'wastage': 'wastage_id',
+    'daily_metrics': 'metric_id',
+    'demographics': 'summary_id',
+}
+
+class LazyTables(dict):
+    """Dataset registry that reads each CSV the first time it is requested."""
 
-# Configure Flask with absolute static folder path
-app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path='')
-CORS(app)  # Enable CORS for frontend communication
+    def __missing__(self, name):
+        if not load_table(name):
+            raise KeyError(name)
+        return dict.__getitem__(self, name)
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or load_table(name)
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
 
 # Global variables to store data
-data = {}
+data = LazyTables()
 model_data = None
+data_version = 0
+data_updated_at = None
+data_token = 'empty'
+_data_lock = threading.Lock()
+_last_insights = None
+_prewarm_thread = None
+_record_store = None
+_vaccination_sketch = None
+_anomaly_detector = None
+_forecaster = None
+_slot_book = None
+_hub_summary = None
+
+# Load state per resource: pending -> loading -> ready | missing | error
+resources = {name: {'state': 'pending'} for name in list(TABLE_FILES) + ['model', 'vaccination_store', 'vaccination_sketch', 'anomaly_detector', 'forecaster', 'slot_book', 'hub_summary']}
+_resource_locks = {name: threading.Lock() for name in resources}
+
+# Live delta events for SSE subscribers (see events.py)
+broker = EventBroker()
+
+# Rows rejected by the data-quality checks on load/ingest, with per-table reports (see validation.py)
+quality = QualityLog()
+# Quarantined rows travel with shared snapshots as extra tables under this prefix
+QUARANTINE_PREFIX = 'quarantine.'
+
+# Computed results for filtered endpoints, keyed on normalized params + data_token.
+# Set RESULT_CACHE_DIR to share results between workers on the same host.
+result_cache = ResultCache(shared_dir=os.environ.get('RESULT_CACHE_DIR'))
+MOVEMENT_FILTERS = ('status', 'from_hub', 'to_hub', 'start_date', 'end_date')
+HUB_FILTERS = ('division', 'hub_type', 'operational_status')
+
+# Write endpoints (reload, ingest) are for operators. With ADMIN_TOKEN set they need a matching
+# X-Admin-Token header; without it they only accept requests from this host. They get no CORS
+# headers, and browser requests from another origin are refused either way.
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+ADMIN_ROUTES = r'/api/(reload|ingest)'
+
+# Set SNAPSHOT_DIR to share one memory-mapped copy of the datasets between workers on a host.
+# Reloads and ingests publish a new version there; other workers follow it on their next request.
+snapshots = SnapshotStore(os.environ['SNAPSHOT_DIR']) if os.environ.get('SNAPSHOT_DIR') else None
+
+# Slot bookings are shared between workers through this SQLite file (default: in SNAPSHOT_DIR).
+# Without either setting they are held per process, which is only safe with a single worker.
+BOOKINGS_DB = os.environ.get('BOOKINGS_DB') or (
+    os.path.join(os.environ['SNAPSHOT_DIR'], 'bookings.sqlite3') if os.environ.get('SNAPSHOT_DIR') else None)
+_bootstrap_lock = threading.Lock()
+
+# Ingests, reloads and snapshot follows are read-modify-write sequences over the tables and the
+# state derived from them, so they run one at a time per process (per host with shared snapshots)
+_write_lock = threading.RLock()
+_write_depth = 0
+
+def _files_fingerprint():
+    """Cheap snapshot token from the CSV files' sizes and mtimes (no data is read)."""
+    fingerprint = hashlib.sha1()
+    for filename in TABLE_FILES.values():
+        try:
+            stat = os.stat(os.path.join(DATA_DIR, filename))
+            fingerprint.update(f'{filename}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+        except OSError:
+            fingerprint.update(f'{filename}:missing;'.encode())
+    return fingerprint.hexdigest()[:16]
+
+def _set_state(name, state, **details):
+    resources[name] = dict({'state': state}, **details)
+
+def _read_table(name, hubs=None):
+    """Read and validate one CSV, recording its load state. Returns the clean DataFrame or None.
+    hubs (the hubs_master table) enables the hub reference checks.
+    """
+    path = os.path.join(DATA_DIR, TABLE_FILES[name])
+    if not os.path.exists(path):
+        _set_state(name, 'missing', error=f'{TABLE_FILES[name]} not found')
+        return None
+    _set_state(name, 'loading')
+    started = time.perf_counter()
+    try:
+        frame = pd.read_csv(path)
+    except Exception as e:
+        _set_state(name, 'error', error=str(e))
+        print(f"❌ Error loading {name}: {e}")
+        return None
+    frame, rejected = _validate(name, frame, 'load', hubs)
+    _set_state(name, 'ready', rows=len(frame), quarantined=rejected,
+               load_seconds=round(time.perf_counter() - started, 4))
+    return frame
+
+def _validate(name, frame, source, hubs=None):
+    """Run the data-quality checks on a batch and quarantine the rows that fail.
+    Returns (clean rows, number rejected).
+    """
+    clean, rejected, summary = validate(name, frame, key=TABLE_KEYS[name], hubs=hubs)
+    quality.record(name, rejected, summary, source)
+    if len(rejected):
+        issues = ', '.join(f'{issue} ({count})' for issue, count in summary['issues'].items())
+        print(f"⚠️ Quarantined {len(rejected)} of {len(frame)} {name} rows: {issues}")
+    return clean, len(rejected)
+
+def load_table(name):
+    """Load a single dataset on first use. Returns True if it is available."""
+    if name not in TABLE_FILES:
+        return False
+    if snapshots is not None and snapshots.header() is None:
+        _bootstrap_snapshot()
+    with _resource_locks[name]:
+        if dict.__contains__(data, name):
+            return True
+        # Failed loads are only retried by an explicit load_data()
+        if resources[name]['state'] in ('missing', 'error'):
+            return False
+        frame = _attach_table(name)
+        if frame is None:
+            frame = _read_table(name, hubs=data.get('hubs') if name != 'hubs' else None)
+        if frame is None:
+            return False
+        with _data_lock:
+            dict.setdefault(data, name, frame)
+        return True
+
+def _attach_table(name):
+    """Zero-copy view of one dataset from the shared snapshot this worker is on, or None."""
+    if snapshots is None:
+        return None
+    header = snapshots.header()
+    if header is None or header['version'] != data_version or name not in header['tables']:
+        return None
+    started = time.perf_counter()
+    frame = snapshots.attach(header, [name])[name]
+    _set_state(name, 'ready', rows=len(frame), load_seconds=round(time.perf_counter() - started, 4),
+               snapshot_version=header['version'])
+    return frame
+
+def _bootstrap_snapshot():
+    """First use with no shared snapshot yet: load every CSV once and publish it for all workers."""
+    with _bootstrap_lock:
+        if snapshots.header() is None:
+            load_data(first_use=True)
+
+@contextmanager
+def _publishing():
+    """Context for read-modify-publish sequences: holds the process-wide write lock and, when
+    shared snapshots are enabled, the cross-process snapshot lock (after catching up with the
+    live snapshot). Re-entrant; nested uses don't take the file lock again."""
+    global _write_depth
+    with _write_lock:
+        _write_depth += 1
+        try:
+            if snapshots is None or _write_depth > 1:
+                yield
+            else:
+                with snapshots.lock():
+                    sync_snapshot()
+                    yield
+        finally:
+            _write_depth -= 1
+
+def _publish(tables, token, full=False, quarantined=None):
+    """Publish tables as the next shared snapshot version and return (attached tables, version).
+    The quarantined rows of `quarantined` (default: the same tables) are published alongside.
+    Without shared snapshots the tables are returned unchanged with version None.
+    """
+    if snapshots is None:
+        return tables, None
+    header = snapshots.header()
+    version = max(header['version'] if header else 0, data_version) + 1
+    published = dict(tables)
+    for name in (tables if quarantined is None else quarantined):
+        if name in quality.quarantine:
+            published[QUARANTINE_PREFIX + name] = quality.quarantine[name]
+    header = snapshots.publish(published, version, token, base=None if full else header,
+                               meta={'quality': quality.export()})
+    return snapshots.attach(header, list(tables)), version
+
+def _restore_quality(header):
+    """Adopt the quality report and quarantined rows published with a shared snapshot."""
+    names = [name for name in header['tables'] if name.startswith(QUARANTINE_PREFIX)]
+    frames = snapshots.attach(header, names)
+    quality.restore(header.get('meta', {}).get('quality'),
+                    {name[len(QUARANTINE_PREFIX):]: frame for name, frame in frames.items()})
+
+def _reset_derived_state(built_only=False):
+    """Drop state derived from the datasets; it is rebuilt from the new tables on next use.
+    built_only skips state that isn't built yet, whose builder may be holding its lock.
+    """
+    resets = [(_record_store, _reset_record_store), (_vaccination_sketch, _reset_vaccination_sketch),
+              (_anomaly_detector, _reset_anomaly_detector), (_forecaster, _reset_forecaster),
+              (_hub_summary, _reset_hub_summary)]
+    for state, reset in resets:
+        if state is not None or not built_only:
+            reset()
+
+def _refresh_slot_book(tables):
+    # Bookings outlive reloads, so the slot book is refreshed in place rather than rebuilt
+    if _slot_book is not None:
+        if 'hubs' in tables:
+            _slot_book.set_hubs(tables['hubs'])
+        if 'daily_metrics' in tables:
+            _slot_book.observe(tables['daily_metrics'])
 
-def load_data():
+def _follow_snapshot():
+    # before_request hook: a non-None return would short-circuit the request
+    sync_snapshot()
+
+def load_data(first_use=False):
     """Load all CSV files into memory using absolute paths.
+    first_use marks the snapshot bootstrap, which runs inside whatever first read a table.
     Returns True on complete success, False otherwise.
     """
-    global data
-    loaded_keys = []
+    token = _files_fingerprint()
+    loaded = {}
+    # hubs is read first, so every other table's hub references are checked against it
+    for key in TABLE_FILES:
+        with _resource_locks[key]:
+            frame = _read_table(key, hubs=loaded.get('hubs'))
+        if frame is not None:
+            loaded[key] = frame
+    failed = [key for key in TABLE_FILES if key not in loaded]
+    if failed:
+        print(f"❌ Error loading data (loaded: {list(loaded)}, failed: {failed})")
+    else:
+        print(f"✅ Loaded datasets: {', '.join(loaded)}")
+    with _publishing():
+        # In shared mode the private copies are dropped in favour of the published snapshot
+        loaded, version = _publish(loaded, token, full=True)
+        # A first-use bootstrap can run inside a derived state's build, holding the lock its reset needs
+        _reset_derived_state(built_only=first_use)
+        # Workers that read identical files share a token, and so share cached results
+        swap_tables(loaded, token=token, version=version)
+    _refresh_slot_book(loaded)
+    return not failed
+
+def sync_snapshot():
+    """Follow the shared snapshot when another worker has published a newer version.
+    Tables this worker already holds are re-attached now (so live deltas are computed), and
+    their changed rows are applied to the state derived from them; the rest attach lazily on
+    first use. Returns True if the worker moved to a new version.
+    """
+    if snapshots is None:
+        return False
+    header = snapshots.header()
+    if header is None or header['version'] == data_version:
+        return False
+    # Following replaces tables and derived state, so it must not interleave with an ingest
+    with _write_lock:
+        header = snapshots.header()
+        if header is None or header['version'] == data_version:
+            return False
+        held = [name for name in TABLE_FILES if dict.__contains__(data, name) and name in header['tables']]
+        frames = snapshots.attach(header, held)
+        # Rows changed elsewhere are applied to the derived state as an ingest here would apply them
+        changes = {name: _changed_rows(dict.get(data, name), frame) for name, frame in frames.items()
+                   if _derives_from(name)}
+        for name, (removed, added) in changes.items():
+            _update_hub_summary(name, frames[name], removed, added)
+        with _data_lock:
+            for name in TABLE_FILES:
+                if name not in held and name in header['tables']:
+                    dict.pop(data, name, None)
+                    _set_state(name, 'pending')
+        swap_tables(frames, token=header['token'], version=header['version'])
+        _restore_quality(header)
+        for name, (removed, added) in changes.items():
+            _update_derived(name, TABLE_KEYS[name], removed, added)
+        _refresh_slot_book(frames)
+    return True
+
+def ingest_records(table, records):
+    """Upsert records into a dataset by its key column and swap the result in.
+    Returns the number of rows written; rows failing validation are quarantined, not written.
+    """
+    key = TABLE_KEYS[table]
+    incoming = pd.DataFrame(records)
+    if key not in incoming:
+        raise ValueError(f"Every record must include '{key}'")
+    # Load the table first: a first CSV load resets its quality report, which would drop this
+    # batch's quarantined rows; hubs is needed for the reference checks. Loading outside the
+    # write lock also keeps a first-use snapshot bootstrap from running under it
+    data.get(table)
+    data.get('hubs')
+    if broker.has_subscribers():
+        # Live insight deltas compare against the insights of the current tables, so every
+        # table they read has to be loaded before this batch replaces one of them
+        for name in INSIGHT_TABLES:
+            data.get(name)
+    with _publishing():
+        # Rows failing the data-quality checks are quarantined instead of written
+        incoming, rejected = _validate(table, incoming, 'ingest', data.get('hubs') if table != 'hubs' else None)
+        if incoming.empty:
+            if rejected:
+                # No data changed, so the token (and cached results) stay; only the quarantine is shared
+                _, version = _publish({}, data_token, quarantined=[table])
+                swap_tables({}, token=data_token, version=version)
+            return 0
+        return _ingest(table, key, incoming)
+
+def _ingest(table, key, incoming):
+    current = data.get(table)
+    if current is None:
+        merged = incoming
+        replaced = incoming.iloc[:0]
+    else:
+        replaced = current[current[key].isin(incoming[key])]
+        merged = pd.concat([current[~current[key].isin(incoming[key])], incoming], ignore_index=True)
+    # The hub summary backs cached /api/hubs results, so it must change before the snapshot token does
+    _update_hub_summary(table, merged, replaced, incoming)
+    token = _next_token()
+    tables, version = _publish({table: merged}, token)
+    swap_tables(tables, token=token, version=version)
+    # The write is committed from here on; derived state that fails to follow is rebuilt instead
+    _update_derived(table, key, replaced, incoming)
+    if _slot_book is not None:
+        # Bookings can't be rebuilt, so a failed slot book update is only logged
+        if table == 'hubs':
+            _derived_update('slot book', lambda: _slot_book.set_hubs(incoming))
+        elif table == 'daily_metrics':
+            _derived_update('slot book', lambda: _slot_book.observe(incoming))
+    return len(incoming)
+
+def _update_hub_summary(table, frame, removed, added):
+    """Apply one table's changed rows to the hub summary. frame is the table's new version;
+    removed holds the old versions of changed or deleted rows, added the new versions."""
+    if _hub_summary is None:
+        return
+    if table == 'hubs':
+        _derived_update('hub summary', lambda: _hub_summary.set_hubs(frame), _reset_hub_summary)
+    elif table == 'inventory':
+        _derived_update('hub summary', lambda: _hub_summary.apply_inventory(removed, added), _reset_hub_summary)
+    elif table == 'daily_metrics':
+        _derived_update('hub summary', lambda: _hub_summary.apply_metrics(removed, added), _reset_hub_summary)
+
+def _update_derived(table, key, removed, added):
+    """Apply one committed table's changed rows to the rest of the state derived from it."""
+    # A row deleted rather than replaced (by a reload elsewhere) can't be taken back out of the
+    # sketch, the anomaly baselines or the forecast history, so those are rebuilt instead
+    deleted = not removed[key].isin(added[key]).all()
+    if table == 'vaccinations':
+        if _record_store is not None:
+            # Ingested rows exist only in the store's buffer, so it is kept even if this fails
+            _derived_update('record store', lambda: _record_store.append(added, removed))
+        if _vaccination_sketch is not None:
+            if deleted:
+                _reset_vaccination_sketch()
+            else:
+                _derived_update('vaccination sketch', lambda: _update_sketch(key, added, removed), _reset_vaccination_sketch)
+    if table == 'daily_metrics' and _anomaly_detector is not None:
+        def detect():
+            alerts = _anomaly_detector.update(added)
+            if alerts:
+                publish_anomalies(alerts)
+        if deleted:
+            _reset_anomaly_detector()
+        else:
+            _derived_update('anomaly detector', detect, _reset_anomaly_detector)
+    if table == 'daily_metrics' and _forecaster is not None:
+        if deleted:
+            _reset_forecaster()
+        else:
+            _derived_update('forecaster', lambda: _forecaster.update(added), _reset_forecaster)
+
+def _derives_from(table):
+    """Whether any state derived from the datasets is currently built from this table."""
+    consumers = {
+        'hubs': [_hub_summary],
+        'inventory': [_hub_summary],
+        'daily_metrics': [_hub_summary, _anomaly_detector, _forecaster],
+        'vaccinations': [_record_store, _vaccination_sketch],
+    }
+    return any(state is not None for state in consumers.get(table, ()))
+
+def _changed_rows(before, after):
+    """Rows that differ between two versions of a table, found by hashing whole rows.
+    Returns (removed, added): the old versions of changed or deleted rows, and the new versions
+    of changed or inserted rows."""
+    before_hashes = pd.util.hash_pandas_object(before.reindex(columns=after.columns), index=False)
+    after_hashes = pd.util.hash_pandas_object(after, index=False)
+    return (before[~before_hashes.isin(after_hashes).to_numpy()],
+            after[~after_hashes.isin(before_hashes).to_numpy()])
+
+def _update_sketch(key, incoming, replaced):
+    """Swap replaced records for their new versions in the vaccination sketch."""
+    if len(replaced):
+        # Distinct-citizen counts can't forget a citizen, so moving a record to another citizen
+        # or hub means a rebuild; otherwise the old versions are subtracted from the counters
+        identity = ['citizen_id', 'hub_id']
+        before = replaced.set_index(key)[identity].astype(str)
+        after = incoming.drop_duplicates(key, keep='last').set_index(key).loc[before.index, identity].astype(str)
+        if not before.equals(after):
+            _reset_vaccination_sketch()
+            return
+        _vaccination_sketch.remove(replaced)
+    _vaccination_sketch.update(incoming, _hub_divisions())
+
+def _derived_update(name, update, reset=None):
+    """Apply one incremental update to state derived from the datasets. A failure is logged and,
+    where the state can be rebuilt from the tables, the state is dropped for a rebuild on next use."""
     try:
-        data['hubs'] = pd.read_csv(os.path.join(DATA_DIR, 'hubs_master.csv'))
-        loaded_keys.append('hubs')
-        data['inventory'] = pd.read_csv(os.path.join(DATA_DIR, 'vaccine_inventory.csv'))
-        loaded_keys.append('inventory')
-        data['movements'] = pd.read_csv(os.path.join(DATA_DIR, 'vaccine_movements.csv'))
-        loaded_keys.append('movements')
-        data['vaccinations'] = pd.read_csv(os.path.join(DATA_DIR, 'vaccination_records.csv'))
-        loaded_keys.append('vaccinations')
-        data['wastage'] = pd.read_csv(os.path.join(DATA_DIR, 'wastage_tracking.csv'))
-        loaded_keys.append('wastage')
-        data['daily_metrics'] = pd.read_csv(os.path.join(DATA_DIR, 'daily_metrics.csv'))
-        loaded_keys.append('daily_metrics')
-        data['demographics'] = pd.read_csv(os.path.join(DATA_DIR, 'demographics_summary.csv'))
-        loaded_keys.append('demographics')
-        print(f"✅ Loaded datasets: {', '.join(loaded_keys)}")
-        return True
+        update()
     except Exception as e:
-        print(f"❌ Error loading data (loaded so far: {loaded_keys}): {e}")
-        return False
+        print(f"⚠️ {name} update failed ({e}); {'rebuilding on next use' if reset else 'left as is'}")
+        if reset is not None:
+            reset()
+
+def _next_token():
+    """Process-local snapshot token for an in-process change."""
+    return hashlib.sha1(f'{data_token}:{os.getpid()}:{data_version + 1}'.encode()).hexdigest()[:16]
+
+# Datasets read by build_insights
+INSIGHT_TABLES = ('wastage', 'inventory', 'demographics', 'movements', 'daily_metrics')
+
+def swap_tables(new_tables, token=None, version=None):
+    """Atomically replace datasets, bump the snapshot version and publish deltas to subscribers.
+    token identifies the snapshot for cached results; in-process changes get a process-local one.
+    version is set explicitly when following a shared snapshot.
+    """
+    global data_version, data_updated_at, data_token, _last_insights
+    if not new_tables and version is None:
+        return data_version
+    with _data_lock:
+        previous = dict(data)
+        data.update(new_tables)
+        data_version = version if version is not None else data_version + 1
+        data_updated_at = datetime.now(timezone.utc)
+        if token is None:
+            token = hashlib.sha1(f'{data_token}:{os.getpid()}:{data_version}'.encode()).hexdigest()[:16]
+        data_token = token
+        version = data_version
+    result_cache.invalidate(token)
+
+    if not broker.has_subscribers():
+        _last_insights = None
+        return version
+    events = []
+    try:
+        if 'movements' in new_tables and 'movements' in previous:
+            events += diff_movements(previous['movements'], new_tables['movements'], data.get('hubs'))
+        if 'inventory' in new_tables and 'inventory' in previous:
+            events += diff_inventory(previous['inventory'], new_tables['inventory'])
+        # Without every table the previous insights read (e.g. some not yet loaded when following
+        # another worker's snapshot) there is nothing to compare; this swap only sets the baseline
+        if _last_insights is None and all(name in previous for name in INSIGHT_TABLES):
+            _last_insights = build_insights(previous)
+        current_insights = build_insights(data)
+        if _last_insights is not None or not previous:
+            events += diff_insights(_last_insights, current_insights)
+        _last_insights = current_insights
+    except Exception as e:
+        print(f"⚠️ Could not compute live deltas for version {version}: {e}")
+    broker.publish(events, version)
+    return version
 
 def load_ml_model():
     """Load the trained ML model if present."""
     global model_data
-    model_path = os.path.join(MODELS_DIR, 'wastage_prediction_model.pkl')
-    try:
-        if os.path.exists(model_path):
-            with open(model_path, 'rb') as f:
-                model_data = pickle.load(f)
-            print("✅ ML model loaded successfully!")
-            return True
-        else:
-            print(f"⚠️ ML model not found at {model_path}. Running in heuristic mode.")
+    with _resource_locks['model']:
+        try:
+            if os.path.exists(MODEL_PATH):
+                _set_state('model', 'loading')
+                started = time.perf_counter()
+                with open(MODEL_PATH, 'rb') as f:
+                    model_data = pickle.load(f)
+                _set_state('model', 'ready', load_seconds=round(time.perf_counter() - started, 4))
+                print("✅ ML model loaded successfully!")
+                return True
+            else:
+                _set_state('model', 'missing', error='model file not found')
+                print(f"⚠️ ML model not found at {MODEL_PATH}. Running in heuristic mode.")
+                return False
+        except Exception as e:
+            _set_state('model', 'error', error=str(e))
+            print(f"❌ Error loading model: {e}")
             return False
-    except Exception as e:
-        print(f"❌ Error loading model: {e}")
-        return False
 
-# Initialize data on startup
-load_data()
-load_ml_model()
+def get_model():
+    """Return the trained model bundle, unpickling it (and sklearn) on first use."""
+    if resources['model']['state'] == 'pending':
+        load_ml_model()
+    return model_data
+
+def get_record_store():
+    """Return the citizen-indexed vaccination store, building it from the CSV if it is stale.
+    Rows are validated as they are stored, so quarantined records never reach the lookups.
+    """
+    global _record_store
+    if _record_store is not None:
+        return _record_store
+    with _resource_locks['vaccination_store']:
+        if _record_store is None:
+            _set_state('vaccination_store', 'loading')
+            started = time.perf_counter()
+            try:
+                csv_path = os.path.join(DATA_DIR, TABLE_FILES['vaccinations'])
+                clean, clean_key = _vaccination_filter()
+                _record_store = RecordStore.open_or_build(csv_path, VACCINATION_STORE_DIR,
+                                                          clean=clean, clean_key=clean_key)
+            except Exception as e:
+                _set_state('vaccination_store', 'error', error=str(e))
+                raise
+            _set_state('vaccination_store', 'ready', rows=len(_record_store),
+                       load_seconds=round(time.perf_counter() - started, 4))
+    return _record_store
+
+def _vaccination_filter():
+    """Chunk filter applying the vaccinations quality rules, and a key that changes with the rules
+    or the known hubs (either can change which rows pass)."""
+    hubs = data.get('hubs')
+    hub_ids = sorted(map(str, hubs['hub_id'].dropna().unique())) if hubs is not None else None
+    key = hashlib.sha1(json.dumps([SCHEMAS['vaccinations'], hub_ids]).encode()).hexdigest()[:16]
+    return (lambda chunk: validate('vaccinations', chunk, key=TABLE_KEYS['vaccinations'], hubs=hubs)[0]), key
+
+def _reset_record_store():
+    """Drop the open store after a reload; it is reopened (and rebuilt if the CSV changed) on next use."""
+    global _record_store
+    with _resource_locks['vaccination_store']:
+        _record_store = None
+        _set_state('vaccination_store', 'pending')
+
+def _hub_divisions():
+    hubs = data.get('hubs')
+    return dict(zip(hubs['hub_id'], hubs['division'])) if hubs is not None else {}
+
+def get_vaccination_sketch():
+    """Return the streaming sketch behind demographics/coverage, building it on first use."""
+    global _vaccination_sketch
+    if _vaccination_sketch is not None:
+        return _vaccination_sketch
+    with _resource_locks['vaccination_sketch']:
+        if _vaccination_sketch is None:
+            _set_state('vaccination_sketch', 'loading')
+            started = time.perf_counter()
+            try:
+                # Built from the validated table (which includes ingested rows), never the raw CSV
+                sketch = VaccinationSketch().update(data['vaccinations'], _hub_divisions())
+            except Exception as e:
+                _set_state('vaccination_sketch', 'error', error=str(e))
+                raise
+            _vaccination_sketch = sketch
+            _set_state('vaccination_sketch', 'ready', rows=sketch.rows,
+                       load_seconds=round(time.perf_counter() - started, 4))
+    return _vaccination_sketch
+
+def get_anomaly_detector():
+    """Return the daily-metrics anomaly detector, warming it up on the history on first use."""
+    global _anomaly_detector
+    if _anomaly_detector is not None:
+        return _anomaly_detector
+    with _resource_locks['anomaly_detector']:
+        if _anomaly_detector is None:
+            _set_state('anomaly_detector', 'loading')
+            started = time.perf_counter()
+            try:
+                detector = AnomalyDetector()
+                detector.update(data['daily_metrics'])
+            except Exception as e:
+                _set_state('anomaly_detector', 'error', error=str(e))
+                raise
+            _anomaly_detector = detector
+            _set_state('anomaly_detector', 'ready', hubs=len(detector.hubs),
+                       load_seconds=round(time.perf_counter() - started, 4))
+    return _anomaly_detector
+
+def _reset_anomaly_detector():
+    global _anomaly_detector
+    with _resource_locks['anomaly_detector']:
+        _anomaly_detector = None
+        _set_state('anomaly_detector', 'pending')
+
+def publish_anomalies(alerts):
+    """Push newly detected anomalies to live subscribers."""
+    divisions = _hub_divisions()
+    broker.publish([
+        make_event('anomaly', alert, [alert['hub_id']], [divisions.get(alert['hub_id'])])
+        for alert in alerts
+    ], data_version)
+
+def get_forecaster():
+    """Return the wastage forecaster, seeding its per-hub history from daily_metrics on first use."""
+    global _forecaster
+    if _forecaster is not None:
+        return _forecaster
+    with _resource_locks['forecaster']:
+        if _forecaster is None:
+            _set_state('forecaster', 'loading')
+            started = time.perf_counter()
+            try:
+                forecaster = WastageForecaster(get_model())
+                forecaster.update(data['daily_metrics'])
+            except Exception as e:
+                _set_state('forecaster', 'error', error=str(e))
+                raise
+            _forecaster = forecaster
+            _set_state('forecaster', 'ready', hubs=len(forecaster.history.hubs),
+                       load_seconds=round(time.perf_counter() - started, 4))
+    return _forecaster
+
+def _reset_forecaster():
+    global _forecaster
+    with _resource_locks['forecaster']:
+        _forecaster = None
+        _set_state('forecaster', 'pending')
+
+def get_slot_book():
+    """Return the dose slot book, seeding capacity and walk-in history on first use."""
+    global _slot_book
+    if _slot_book is not None:
+        return _slot_book
+    with _resource_locks['slot_book']:
+        if _slot_book is None:
+            _set_state('slot_book', 'loading')
+            started = time.perf_counter()
+            try:
+                shared = SharedBookings(BOOKINGS_DB) if BOOKINGS_DB else None
+                book = SlotBook(shared=shared).set_hubs(data['hubs']).observe(data['daily_metrics'])
+            except Exception as e:
+                _set_state('slot_book', 'error', error=str(e))
+                raise
+            _slot_book = book
+            _set_state('slot_book', 'ready', hubs=len(book.hubs),
+                       load_seconds=round(time.perf_counter() - started, 4))
+    return _slot_book
+
+def get_hub_summary():
+    """Return the maintained per-hub summary behind /api/hubs, building it on first use."""
+    global _hub_summary
+    if _hub_summary is not None:
+        return _hub_summary
+    with _resource_locks['hub_summary']:
+        if _hub_summary is None:
+            _set_state('hub_summary', 'loading')
+            started = time.perf_counter()
+            try:
+                summary = HubSummary(data['hubs'])
+                summary.apply_inventory(added=data['inventory'])
+                summary.apply_metrics(added=data['daily_metrics'])
+            except Exception as e:
+                _set_state('hub_summary', 'error', error=str(e))
+                raise
+            _hub_summary = summary
+            _set_state('hub_summary', 'ready', hubs=len(summary.hubs),
+                       load_seconds=round(time.perf_counter() - started, 4))
+    return _hub_summary
+
+def _reset_hub_summary():
+    global _hub_summary
+    with _resource_locks['hub_summary']:
+        _hub_summary = None
+        _set_state('hub_summary', 'pending')
+
+def _reset_vaccination_sketch():
+    global _vaccination_sketch
+    with _resource_locks['vaccination_sketch']:
+        _vaccination_sketch = None
+        _set_state('vaccination_sketch', 'pending')
+
+def prewarm():
+    """Load every dataset and the model on a background thread so first requests don't wait."""
+    global _prewarm_thread
+
+    def run():
+        started = time.perf_counter()
+        for name in TABLE_FILES:
+            load_table(name)
+        get_model()
+        try:
+            get_record_store()
+            get_vaccination_sketch()
+        except Exception as e:
+            print(f"⚠️ Vaccination record store unavailable: {e}")
+        try:
+            get_anomaly_detector()
+        except Exception as e:
+            print(f"⚠️ Anomaly detector unavailable: {e}")
+        try:
+            get_forecaster()
+        except Exception as e:
+            print(f"⚠️ Wastage forecaster unavailable: {e}")
+        try:
+            get_slot_book()
+        except Exception as e:
+            print(f"⚠️ Slot book unavailable: {e}")
+        try:
+            get_hub_summary()
+        except Exception as e:
+            print(f"⚠️ Hub summary unavailable: {e}")
+        print(f"🔥 Prewarm finished in {time.perf_counter() - started:.2f}s")
+
+    if _prewarm_thread is None or not _prewarm_thread.is_alive():
+        _prewarm_thread = threading.Thread(target=run, name='prewarm', daemon=True)
+        _prewarm_thread.start()
+    return _prewarm_thread
 
 # ============================================================================
 # HEALTH CHECK & FRONTEND SERVING
 # ============================================================================
 
-@app.route('/')
+@api.route('/')
 def index():
     """Serve the index.html file from the frontend folder"""
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_from_directory(current_app.static_folder, 'index.html')
 
-@app.route('/api')
+@api.route('/api')
 def api_home():
     """API health check"""
     return jsonify({
@@ -97,15 +800,54 @@ def api_home():
             'coverage': '/api/coverage',
             'demographics': '/api/demographics',
             'insights': '/api/insights',
-            'hubs': '/api/hubs'
+            'hubs': '/api/hubs',
+            'stream': '/api/stream',
+            'reload': '/api/reload',
+            'ingest': '/api/ingest/<table>',
+            'cache_stats': '/api/cache/stats',
+            'ready': '/api/ready',
+            'citizen_doses': '/api/citizens/<citizen_id>/doses',
+            'hub_daily_vaccinations': '/api/hubs/<hub_id>/vaccinations/daily',
+            'anomalies': '/api/anomalies',
+            'slots': '/api/slots',
+            'slots_reserve': '/api/slots/reserve',
+            'slots_release': '/api/slots/release',
+            'quality': '/api/quality',
+            'quality_quarantine': '/api/quality/<table>'
         }
     })
 
+@api.route('/api/ready')
+def api_ready():
+    """Readiness check reporting the load state of every dataset and the model"""
+    states = {name: info['state'] for name, info in resources.items()}
+    # Only the startup prewarm makes the worker unready; a resource loading later (on first use
+    # or for a reload) is served from the current data meanwhile or loaded by the request itself
+    warming = _prewarm_thread is not None and _prewarm_thread.is_alive()
+    # A dataset that failed to load breaks the endpoints reading it; the model is optional
+    failed = sorted(name for name in TABLE_FILES if states.get(name) in ('error', 'missing'))
+    if warming:
+        status = 'warming'
+    elif failed:
+        status = 'degraded'
+    elif 'pending' in states.values() or 'loading' in states.values():
+        status = 'lazy'  # serving; remaining resources load on first use
+    else:
+        status = 'ready'
+    return jsonify({
+        'status': status,
+        'data': {
+            'version': data_version,
+            'failed': failed,
+            'resources': resources
+        }
+    }), 503 if warming or failed else 200
+
 # ============================================================================
 # 1. OVERVIEW / DASHBOARD STATS
 # ============================================================================
 
-@app.route('/api/overview', methods=['GET'])
+@api.route('/api/overview', methods=['GET'])
 def get_overview():
     """Get overview statistics for dashboard"""
     try:
@@ -117,7 +859,8 @@ def get_overview():
         total_remaining = data['inventory'].get('quantity_remaining', pd.Series(dtype=float)).sum()
         
         wastage_rate = (total_wasted / total_vaccines * 100) if total_vaccines > 0 else 0
-        coverage = len(data['vaccinations']) if 'vaccinations' in data else 0
+        # A vaccinations table that failed to load is reported through the error path below
+        coverage = len(data['vaccinations'])
         
         # Recent activity
         recent_movements = data['movements'].sort_values('transfer_date', ascending=False).head(5) if 'movements' in data else pd.DataFrame(columns=['transfer_id','from_hub_name','to_hub_name','vaccine_name','quantity_transferred','status'])
@@ -143,51 +886,54 @@ def get_overview():
 # 2. VACCINE MOVEMENT TRACKING
 # ============================================================================
 
-@app.route('/api/movements', methods=['GET'])
+def compute_movements(params):
+    """Filter, sort and summarize movements for the given query parameters"""
+    movements = data['movements'].copy()
+    
+    status = params.get('status')
+    from_hub = params.get('from_hub')
+    to_hub = params.get('to_hub')
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    
+    if status:
+        movements = movements[movements['status'] == status]
+    if from_hub:
+        movements = movements[movements['from_hub_id'] == from_hub]
+    if to_hub:
+        movements = movements[movements['to_hub_id'] == to_hub]
+    if start_date:
+        movements = movements[movements['transfer_date'] >= start_date]
+    if end_date:
+        movements = movements[movements['transfer_date'] <= end_date]
+    
+    # Sort by date (newest first)
+    movements = movements.sort_values('transfer_date', ascending=False)
+    
+    # Get summary stats
+    total_transfers = len(movements)
+    in_transit = len(movements[movements['status'] == 'In_Transit'])
+    delivered = len(movements[movements['status'] == 'Delivered'])
+    delayed = len(movements[movements['status'] == 'Delayed'])
+    
+    return {
+        'movements': movements.to_dict('records'),
+        'summary': {
+            'total_transfers': int(total_transfers),
+            'in_transit': int(in_transit),
+            'delivered': int(delivered),
+            'delayed': int(delayed)
+        }
+    }
+
+@api.route('/api/movements', methods=['GET'])
 def get_movements():
     """Get vaccine movement/transfer records with optional filtering"""
     try:
-        movements = data['movements'].copy()
-        
         # Apply filters from query parameters
-        status = request.args.get('status')
-        from_hub = request.args.get('from_hub')
-        to_hub = request.args.get('to_hub')
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        
-        if status:
-            movements = movements[movements['status'] == status]
-        if from_hub:
-            movements = movements[movements['from_hub_id'] == from_hub]
-        if to_hub:
-            movements = movements[movements['to_hub_id'] == to_hub]
-        if start_date:
-            movements = movements[movements['transfer_date'] >= start_date]
-        if end_date:
-            movements = movements[movements['transfer_date'] <= end_date]
-        
-        # Sort by date (newest first)
-        movements = movements.sort_values('transfer_date', ascending=False)
-        
-        # Get summary stats
-        total_transfers = len(movements)
-        in_transit = len(movements[movements['status'] == 'In_Transit'])
-        delivered = len(movements[movements['status'] == 'Delivered'])
-        delayed = len(movements[movements['status'] == 'Delayed'])
-        
-        return jsonify({
-            'status': 'success',
-            'data': {
-                'movements': movements.to_dict('records'),
-                'summary': {
-                    'total_transfers': int(total_transfers),
-                    'in_transit': int(in_transit),
-                    'delivered': int(delivered),
-                    'delayed': int(delayed)
-                }
-            }
-        })
+        params = {name: request.args.get(name) for name in MOVEMENT_FILTERS}
+        result = result_cache.get_or_compute('movements', params, data_token, lambda: compute_movements(params))
+        return jsonify({'status': 'success', 'data': result})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
@@ -195,71 +941,67 @@ def get_movements():
 # 3. WASTAGE PREDICTION & ANALYSIS
 # ============================================================================
 
-@app.route('/api/wastage/predict', methods=['POST'])
+def compute_wastage_prediction(hub_id, horizon=7):
+    """Forecast wastage for the next `horizon` days, for one hub or averaged over all hubs"""
+    # If ML model isn't available, the forecaster falls back to a heuristic on recent history
+    model = get_model()
+    model_available = model is not None
+
+    predictions = get_forecaster().forecast(hub_id, horizon)
+
+    result = {
+        'hub_id': hub_id or 'all_hubs',
+        'prediction_period': f'{horizon}_days',
+        'horizon': horizon,
+        'interval': {'lower': 'p10', 'upper': 'p90'},
+        'predictions': predictions,
+        'average_predicted_wastage': round(float(np.mean([p['predicted_wastage_rate'] for p in predictions])), 2)
+    }
+
+    # Attach model info if available; otherwise indicate heuristic fallback
+    if model_available:
+        result['model_info'] = {
+            'model_nameWorking': model.get('model_name', 'Unknown'),
+            'model_r2': round(model.get('metrics', {}).get('R2', 0), 4)
+        }
+    else:
+        result['model_info'] = {
+            'model_name': 'HeuristicAverageLast7Days',
+            'note': 'Fallback used because trained model not loaded'
+        }
+
+    return result
+
+@api.route('/api/wastage/predict', methods=['POST'])
 def predict_wastage():
-    """Predict wastage for next 7 days"""
+    """Predict wastage for the next 7, 30 or 90 days with prediction intervals"""
     try:
-        # If ML model isn't available, gracefully fall back to heuristic prediction
-        model_available = model_data is not None
-        
         # Get request data
-        req_data = request.json
+        req_data = request.get_json(silent=True) or {}
         hub_id = req_data.get('hub_id', None)
-        
-        # Get recent data for prediction
-        recent_metrics = data['daily_metrics'].copy()
-        recent_metrics['date'] = pd.to_datetime(recent_metrics['date'])
-        
-        if hub_id:
-            recent_metrics = recent_metrics[recent_metrics['hub_id'] == hub_id]
-        
-        # Use last 7 days of data to predict next 7 days
-        recent_metrics = recent_metrics.sort_values('date').tail(7)
-        
-        # Simple prediction: use average of last 7 days with slight trend
-        avg_wastage = recent_metrics['wastage_rate'].mean()
-        predictions = []
-        
-        base_date = datetime.now()
-        for i in range(7):
-            pred_date = base_date + timedelta(days=i+1)
-            # Add some variation based on day of week (weekends slightly higher)
-            variation = 1.2 if pred_date.weekday() >= 5 else 1.0
-            pred_value = avg_wastage * variation * (1 + np.random.uniform(-0.1, 0.1))
-            
-            predictions.append({
-                'date': pred_date.strftime('%Y-%m-%d'),
-                'predicted_wastage_rate': round(pred_value, 2),
-                'day_of_week': pred_date.strftime('%A')
-            })
-        
-        response_payload = {
-            'status': 'success',
-            'data': {
-                'hub_id': hub_id or 'all_hubs',
-                'prediction_period': '7_days',
-                'predictions': predictions,
-                'average_predicted_wastage': round(np.mean([p['predicted_wastage_rate'] for p in predictions]), 2)
-            }
-        }
+        try:
+            horizon = int(req_data.get('horizon', 7))
+        except (TypeError, ValueError):
+            horizon = None
+        if horizon not in FORECAST_HORIZONS:
+            return jsonify({
+                'status': 'error',
+                'message': f'horizon must be one of {", ".join(map(str, FORECAST_HORIZONS))}'
+            }), 400
 
-        # Attach model info if available; otherwise indicate heuristic fallback
-        if model_available:
-            response_payload['data']['model_info'] = {
-                'model_nameWorking': model_data.get('model_name', 'Unknown'),
-                'model_r2': round(model_data.get('metrics', {}).get('R2', 0), 4)
-            }
-        else:
-            response_payload['data']['model_info'] = {
-                'model_name': 'HeuristicAverageLast7Days',
-                'note': 'Fallback used because trained model not loaded'
-            }
-
-        return jsonify(response_payload)
+        # Predictions start tomorrow, so today's date is part of the cache key
+        params = {'hub_id': hub_id, 'horizon': horizon, 'as_of': datetime.now().strftime('%Y-%m-%d')}
+        result = result_cache.get_or_compute('wastage_predict', params, data_token,
+                                             lambda: compute_wastage_prediction(hub_id, horizon))
+        return jsonify({'status': 'success', 'data': result})
+    except KeyError as e:
+        if hub_id and e.args == (hub_id,):
+            return jsonify({'status': 'error', 'message': 'No daily metrics for this hub'}), 404
+        return jsonify({'status': 'error', 'message': str(e)}), 500
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-@app.route('/api/wastage/stats', methods=['GET'])
+@api.route('/api/wastage/stats', methods=['GET'])
 def get_wastage_stats():
     """Get wastage statistics and trends"""
     try:
@@ -311,11 +1053,11 @@ def get_wastage_stats():
 # 4. COVERAGE & DEMOGRAPHICS
 # ============================================================================
 
-@app.route('/api/coverage', methods=['GET'])
+@api.route('/api/coverage', methods=['GET'])
 def get_coverage():
     """Get vaccination coverage statistics by region, division"""
     try:
-        vaccinations = data['vaccinations'].copy()
+        sketch = get_vaccination_sketch()
         demographics = data['demographics'].copy()
         
         # Coverage by division
@@ -332,13 +1074,15 @@ def get_coverage():
             'coverage_percentage': 'mean'
         }).reset_index()
         
-        # Vaccination trend over time
-        vaccinations['vaccination_date'] = pd.to_datetime(vaccinations['vaccination_date'])
-        daily_vaccinations = vaccinations.groupby('vaccination_date').size().reset_index(name='count')
-        daily_vaccinations = daily_vaccinations.sort_values('vaccination_date')
+        # Vaccination trend over time (exact per-day counters kept by the sketch)
+        daily_counts = sketch.exact['vaccination_date']
+        daily_vaccinations = pd.DataFrame({
+            'vaccination_date': pd.to_datetime(list(daily_counts.keys())),
+            'count': list(daily_counts.values())
+        }).sort_values('vaccination_date')
         
         # Dose distribution
-        dose_distribution = vaccinations['dose_number'].value_counts().sort_index()
+        dose_distribution = pd.Series(sketch.exact['dose_number'], dtype='int64').sort_index()
         
         return jsonify({
             'status': 'success',
@@ -352,33 +1096,30 @@ def get_coverage():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-@app.route('/api/demographics', methods=['GET'])
+@api.route('/api/demographics', methods=['GET'])
 def get_demographics():
     """Get demographic breakdown of vaccinations"""
     try:
-        vaccinations = data['vaccinations'].copy()
-        
-        # Age group distribution
-        age_distribution = vaccinations['age_group'].value_counts()
-        
-        # Gender distribution
-        gender_distribution = vaccinations['gender'].value_counts()
-        
-        # Occupation distribution
-        occupation_distribution = vaccinations['occupation'].value_counts()
-        
-        # Comorbidity stats
-        comorbidity_stats = vaccinations['comorbidity'].value_counts()
+        # Answered from incrementally maintained sketches instead of scanning every record
+        sketch = get_vaccination_sketch()
+        occupation = sketch.heavy['occupation']
+        comorbidity_stats = sketch.exact['comorbidity']
         
         return jsonify({
             'status': 'success',
             'data': {
-                'age_groups': age_distribution.to_dict(),
-                'gender': gender_distribution.to_dict(),
-                'occupation': occupation_distribution.to_dict(),
+                'age_groups': sketch.counts('age_group'),
+                'gender': sketch.counts('gender'),
+                'occupation': occupation.top(),
                 'comorbidity': {
                     'with_comorbidity': int(comorbidity_stats.get(True, 0)),
                     'without_comorbidity': int(comorbidity_stats.get(False, 0))
+                },
+                'distinct_citizens': sketch.distinct_citizens(),
+                'top_batches': sketch.heavy['batch_id'].top(10),
+                'error_bounds': {
+                    'occupation_max_overcount': occupation.error_bound(),
+                    'batch_max_overcount': sketch.heavy['batch_id'].error_bound()
                 }
             }
         })
@@ -389,85 +1130,104 @@ def get_demographics():
 # 5. SMART INSIGHTS
 # ============================================================================
 
-@app.route('/api/insights', methods=['GET'])
-def get_insights():
-    """Generate smart insights and recommendations"""
-    try:
-        insights = []
-        
-        # Insight 1: Hub with highest wastage
-        wastage_by_hub = data['wastage'].groupby(['hub_id', 'hub_name'])['quantity_wasted'].sum().sort_values(ascending=False)
-        if len(wastage_by_hub) > 0:
-            top_hub = wastage_by_hub.index[0]
-            top_wastage = wastage_by_hub.iloc[0]
-            insights.append({
-                'type': 'warning',
-                'title': 'High Wastage Alert',
-                'message': f'{top_hub[1]} has the highest wastage with {int(top_wastage)} vaccines wasted.',
-                'recommendation': 'Review cold chain management and staff training at this hub.',
-                'priority': 'high'
-            })
-        
-        # Insight 2: Low stock alert
-        low_stock_hubs = data['inventory'][data['inventory']['quantity_remaining'] < 500]
-        if len(low_stock_hubs) > 0:
-            insights.append({
-                'type': 'alert',
-                'title': 'Low Stock Warning',
-                'message': f'{len(low_stock_hubs)} hubs have critically low stock (< 500 vaccines).',
-                'recommendation': 'Prioritize restocking for these hubs to avoid shortages.',
-                'priority': 'high'
-            })
-        
-        # Insight 3: Coverage insight
-        avg_coverage = data['demographics']['coverage_percentage'].mean()
-        if avg_coverage < 70:
-            insights.append({
-                'type': 'info',
-                'title': 'Coverage Below Target',
-                'message': f'Average coverage is {avg_coverage:.1f}%, below the 70% target.',
-                'recommendation': 'Increase awareness campaigns and mobile vaccination units.',
-                'priority': 'medium'
-            })
-        else:
-            insights.append({
-                'type': 'success',
-                'title': 'Good Coverage',
-                'message': f'Average coverage is {avg_coverage:.1f}%, meeting targets!',
-                'recommendation': 'Maintain current momentum and focus on underserved areas.',
-                'priority': 'low'
-            })
-        
-        # Insight 4: In-transit vaccines
-        in_transit = data['movements'][data['movements']['status'] == 'In_Transit']
-        if len(in_transit) > 0:
-            total_in_transit = in_transit['quantity_transferred'].sum()
-            insights.append({
-                'type': 'info',
-                'title': 'Vaccines In Transit',
-                'message': f'{int(total_in_transit)} vaccines are currently in transit across {len(in_transit)} transfers.',
-                'recommendation': 'Monitor delivery status and ensure cold chain maintenance.',
-                'priority': 'medium'
-            })
-        
-        # Insight 5: Weekend wastage pattern
-        daily_metrics = data['daily_metrics'].copy()
-        weekend_wastage = daily_metrics[daily_metrics['is_holiday'] == True]['wastage_rate'].mean()
-        weekday_wastage = daily_metrics[daily_metrics['is_holiday'] == False]['wastage_rate'].mean()
-        
-        if weekend_wastage > weekday_wastage * 1.2:
+def build_insights(tables):
+    """Generate smart insights and recommendations from the given datasets"""
+    insights = []
+    
+    # Insight 1: Hub with highest wastage
+    wastage_by_hub = tables['wastage'].groupby(['hub_id', 'hub_name'])['quantity_wasted'].sum().sort_values(ascending=False)
+    if len(wastage_by_hub) > 0:
+        top_hub = wastage_by_hub.index[0]
+        top_wastage = wastage_by_hub.iloc[0]
+        insights.append({
+            'type': 'warning',
+            'title': 'High Wastage Alert',
+            'message': f'{top_hub[1]} has the highest wastage with {int(top_wastage)} vaccines wasted.',
+            'recommendation': 'Review cold chain management and staff training at this hub.',
+            'priority': 'high'
+        })
+    
+    # Insight 2: Low stock alert
+    low_stock_hubs = tables['inventory'][tables['inventory']['quantity_remaining'] < 500]
+    if len(low_stock_hubs) > 0:
+        insights.append({
+            'type': 'alert',
+            'title': 'Low Stock Warning',
+            'message': f'{len(low_stock_hubs)} hubs have critically low stock (< 500 vaccines).',
+            'recommendation': 'Prioritize restocking for these hubs to avoid shortages.',
+            'priority': 'high'
+        })
+    
+    # Insight 3: Coverage insight
+    avg_coverage = tables['demographics']['coverage_percentage'].mean()
+    if avg_coverage < 70:
+        insights.append({
+            'type': 'info',
+            'title': 'Coverage Below Target',
+            'message': f'Average coverage is {avg_coverage:.1f}%, below the 70% target.',
+            'recommendation': 'Increase awareness campaigns and mobile vaccination units.',
+            'priority': 'medium'
+        })
+    else:
+        insights.append({
+            'type': 'success',
+            'title': 'Good Coverage',
+            'message': f'Average coverage is {avg_coverage:.1f}%, meeting targets!',
+            'recommendation': 'Maintain current momentum and focus on underserved areas.',
+            'priority': 'low'
+        })
+    
+    # Insight 4: In-transit vaccines
+    in_transit = tables['movements'][tables['movements']['status'] == 'In_Transit']
+    if len(in_transit) > 0:
+        total_in_transit = in_transit['quantity_transferred'].sum()
+        insights.append({
+            'type': 'info',
+            'title': 'Vaccines In Transit',
+            'message': f'{int(total_in_transit)} vaccines are currently in transit across {len(in_transit)} transfers.',
+            'recommendation': 'Monitor delivery status and ensure cold chain maintenance.',
+            'priority': 'medium'
+        })
+    
+    # Insight 5: Weekend wastage pattern
+    daily_metrics = tables['daily_metrics'].copy()
+    weekend_wastage = daily_metrics[daily_metrics['is_holiday'] == True]['wastage_rate'].mean()
+    weekday_wastage = daily_metrics[daily_metrics['is_holiday'] == False]['wastage_rate'].mean()
+    
+    if weekend_wastage > weekday_wastage * 1.2:
+        insights.append({
+            'type': 'warning',
+            'title': 'Weekend Wastage Pattern',
+            'message': f'Weekend wastage rate ({weekend_wastage:.1f}%) is {((weekend_wastage/weekday_wastage - 1) * 100):.0f}% higher than weekdays.',
+            'recommendation': 'Adjust stock levels and staffing for weekends.',
+            'priority': 'medium'
+        })
+
+    # Insight 6: Cold-chain / wastage anomalies in the most recent week of metrics
+    detector = get_anomaly_detector()
+    if detector.latest_day is not None:
+        since = str(detector.latest_day - np.timedelta64(6, 'D'))
+        recent = detector.recent_alerts(since=since, limit=None)
+        if recent:
+            hubs = sorted({alert['hub_name'] or alert['hub_id'] for alert in recent})
             insights.append({
                 'type': 'warning',
-                'title': 'Weekend Wastage Pattern',
-                'message': f'Weekend wastage rate ({weekend_wastage:.1f}%) is {((weekend_wastage/weekday_wastage - 1) * 100):.0f}% higher than weekdays.',
-                'recommendation': 'Adjust stock levels and staffing for weekends.',
-                'priority': 'medium'
+                'title': 'Cold-Chain & Wastage Anomalies',
+                'message': f'{len(recent)} unusual readings at {len(hubs)} hubs in the week to {detector.latest_day}: {", ".join(hubs[:3])}{f" and {len(hubs) - 3} more" if len(hubs) > 3 else ""}.',
+                'recommendation': 'Check power backup, refrigeration logs and handling at the flagged hubs.',
+                'priority': 'high' if any(alert['severity'] == 'high' for alert in recent) else 'medium'
             })
-        
+
+    return insights
+
+@api.route('/api/insights', methods=['GET'])
+def get_insights():
+    """Generate smart insights and recommendations"""
+    try:
         return jsonify({
             'status': 'success',
             'data': {
-                'insights': insights,
+                'insights': build_insights(data),
                 'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
         })
@@ -478,39 +1238,28 @@ def get_insights():
 # 6. HUBS MANAGEMENT
 # ============================================================================
 
-@app.route('/api/hubs', methods=['GET'])
+def compute_hubs(params):
+    """Filter the maintained hub summary; results are cached per filter combination"""
+    hubs = get_hub_summary().projection()
+    for column in HUB_FILTERS:
+        if params.get(column):
+            hubs = hubs[hubs[column] == params[column]]
+    return {'hubs': hubs.to_dict('records')}
+
+@api.route('/api/hubs', methods=['GET'])
 def get_hubs():
-    """Get all hubs with their current inventory"""
+    """Get all hubs with their current inventory and utilization"""
     try:
-        hubs = data['hubs'].copy()
-        inventory = data['inventory'].copy()
-        
-        # Aggregate inventory by hub
-        hub_inventory = inventory.groupby('hub_id').agg({
-            'quantity_remaining': 'sum',
-            'quantity_wasted': 'sum',
-            'quantity_administered': 'sum'
-        }).reset_index()
-        
-        # Merge with hubs data
-        hubs_with_inventory = hubs.merge(hub_inventory, on='hub_id', how='left')
-        hubs_with_inventory = hubs_with_inventory.fillna(0)
-        
-        # Calculate utilization
-        daily_metrics = data['daily_metrics'].copy()
-        recent_utilization = daily_metrics.groupby('hub_id')['utilization_rate'].mean().reset_index()
-        hubs_with_inventory = hubs_with_inventory.merge(recent_utilization, on='hub_id', how='left')
-        
+        params = {name: request.args.get(name) for name in HUB_FILTERS}
+        result = result_cache.get_or_compute('hubs', params, data_token, lambda: compute_hubs(params))
         return jsonify({
             'status': 'success',
-            'data': {
-                'hubs': hubs_with_inventory.to_dict('records')
-            }
+            'data': result
         })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-@app.route('/api/hubs/<hub_id>', methods=['GET'])
+@api.route('/api/hubs/<hub_id>', methods=['GET'])
 def get_hub_details(hub_id):
     """Get detailed information for a specific hub"""
     try:
@@ -539,6 +1288,324 @@ def get_hub_details(hub_id):
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+# ============================================================================
+# 7. LIVE UPDATES, RELOAD & INGESTION
+# ============================================================================
+
+def _split_arg(name):
+    """Parse a comma-separated query parameter into a list."""
+    value = request.args.get(name, '')
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+@api.route('/api/stream', methods=['GET'])
+def stream_events():
+    """Server-Sent Events stream of dataset deltas, filtered by hub_id/division/types"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    subscription = broker.subscribe(
+        hub_ids=_split_arg('hub_id'),
+        divisions=_split_arg('division'),
+        event_types=_split_arg('types'),
+        last_event_id=int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    )
+    return Response(
+        stream_with_context(broker.stream(subscription)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def admin_only(view):
+    """Guard a write endpoint (see ADMIN_TOKEN)."""
+    @wraps(view)
+    def guarded(*args, **kwargs):
+        origin = request.headers.get('Origin')
+        if origin and origin.rstrip('/') != request.host_url.rstrip('/'):
+            return jsonify({'status': 'error', 'message': 'Cross-origin writes are not allowed'}), 403
+        if ADMIN_TOKEN:
+            supplied = request.headers.get('X-Admin-Token', '')
+            if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+                return jsonify({'status': 'error', 'message': 'Invalid or missing X-Admin-Token'}), 401
+        elif request.remote_addr not in LOCAL_ADDRESSES:
+            return jsonify({'status': 'error', 'message': 'Set ADMIN_TOKEN to allow writes from other hosts'}), 403
+        return view(*args, **kwargs)
+    return guarded
+
+@api.route('/api/reload', methods=['POST'])
+@admin_only
+def reload_data():
+    """Re-read all CSV files and push any resulting deltas to subscribers"""
+    try:
+        success = load_data()
+        return jsonify({
+            'status': 'success' if success else 'error',
+            'data': {'version': data_version, 'datasets': list(data)}
+        }), 200 if success else 500
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@api.route('/api/ingest/<table>', methods=['POST'])
+@admin_only
+def ingest(table):
+    """Upsert a batch of records (JSON body: {"records": [...]}) into a dataset"""
+    try:
+        if table not in TABLE_KEYS:
+            return jsonify({'status': 'error', 'message': f'Unknown dataset: {table}'}), 404
+        records = (request.json or {}).get('records', [])
+        if not records:
+            return jsonify({'status': 'error', 'message': 'No records supplied'}), 400
+        written = ingest_records(table, records)
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'table': table,
+                'records_written': written,
+                'records_quarantined': len(records) - written,
+                'version': data_version
+            }
+        })
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+# ============================================================================
+# 8. CACHE STATISTICS
+# ============================================================================
+
+@api.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Hit/miss/eviction statistics for the result and response caches"""
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'version': data_version,
+            'token': data_token,
+            'results': result_cache.stats(),
+            'responses': current_app.extensions['response_compressor'].bodies.stats(),
+            'snapshot': snapshots.stats() if snapshots is not None else None
+        }
+    })
+
+# ============================================================================
+# 9. VACCINATION RECORDS
+# ============================================================================
+
+@api.route('/api/citizens/<citizen_id>/doses', methods=['GET'])
+def get_citizen_doses(citizen_id):
+    """Dose history for one citizen, for next-dose scheduling"""
+    try:
+        doses = get_record_store().doses(citizen_id)
+        if len(doses) == 0:
+            return jsonify({'status': 'error', 'message': 'No vaccination records for this citizen'}), 404
+        last = doses.iloc[-1]
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'citizen_id': citizen_id,
+                'doses_received': int(len(doses)),
+                'highest_dose_number': int(doses['dose_number'].max()),
+                'next_dose_number': int(doses['dose_number'].max()) + 1,
+                'last_vaccination_date': last['vaccination_date'],
+                'last_vaccine_name': last['vaccine_name'],
+                'last_hub_id': last['hub_id'],
+                'doses': doses.to_dict('records')
+            }
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@api.route('/api/hubs/<hub_id>/vaccinations/daily', methods=['GET'])
+def get_hub_daily_vaccinations(hub_id):
+    """Vaccinations per day at one hub, optionally between start_date and end_date"""
+    try:
+        counts = get_record_store().hub_daily_counts(
+            hub_id, request.args.get('start_date'), request.args.get('end_date'))
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'hub_id': hub_id,
+                'total': int(counts.sum()),
+                'daily_counts': [{'date': date, 'count': int(count)} for date, count in counts.items()]
+            }
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+# ============================================================================
+# 10. ANOMALY DETECTION
+# ============================================================================
+
+@api.route('/api/anomalies', methods=['GET'])
+def get_anomalies():
+    """Flagged cold-chain and wastage spikes, filterable by hub_id, metric and since (date)"""
+    try:
+        detector = get_anomaly_detector()
+        hub_id = request.args.get('hub_id')
+        limit = request.args.get('limit', 100, type=int)
+        anomalies = detector.recent_alerts(
+            hub_id=hub_id, metric=request.args.get('metric'), since=request.args.get('since'), limit=limit)
+        by_metric = {}
+        for alert in anomalies:
+            by_metric[alert['metric']] = by_metric.get(alert['metric'], 0) + 1
+        result = {
+            'anomalies': anomalies,
+            'summary': {
+                'total': len(anomalies),
+                'by_metric': by_metric,
+                'latest_day': str(detector.latest_day) if detector.latest_day is not None else None,
+                'threshold': detector.threshold
+            }
+        }
+        if hub_id:
+            result['baselines'] = detector.baselines(hub_id)
+        return jsonify({'status': 'success', 'data': result})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+# ============================================================================
+# 11. DOSE SLOT SCHEDULING
+# ============================================================================
+
+def _parse_day(value):
+    return date.fromisoformat(value) if value else None
+
+@api.route('/api/slots', methods=['GET'])
+def get_slots():
+    """Capacity, expected walk-ins, bookings and available slots per day for one hub"""
+    try:
+        hub_id = request.args.get('hub_id')
+        if not hub_id:
+            return jsonify({'status': 'error', 'message': 'hub_id is required'}), 400
+        book = get_slot_book()
+        days = request.args.get('days', 14, type=int)
+        schedule = book.schedule(hub_id, _parse_day(request.args.get('start_date')), days)
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'hub_id': hub_id,
+                'hub_name': book.hub_names.get(hub_id),
+                'days': schedule,
+                'total_available': sum(day['available'] for day in schedule)
+            }
+        })
+    except KeyError:
+        return jsonify({'status': 'error', 'message': 'Hub not found'}), 404
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@api.route('/api/slots/reserve', methods=['POST'])
+def reserve_slot():
+    """Book slots at a hub on a given date, or on the earliest date with room"""
+    try:
+        req_data = request.get_json(silent=True) or {}
+        hub_id = req_data.get('hub_id')
+        if not hub_id:
+            return jsonify({'status': 'error', 'message': 'hub_id is required'}), 400
+        reservation = get_slot_book().reserve(
+            hub_id, _parse_day(req_data.get('date')), int(req_data.get('count', 1)), req_data.get('citizen_id'))
+        if reservation is None:
+            return jsonify({'status': 'error', 'message': 'No slots available at this hub'}), 409
+        return jsonify({'status': 'success', 'data': reservation})
+    except KeyError:
+        return jsonify({'status': 'error', 'message': 'Hub not found'}), 404
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@api.route('/api/slots/release', methods=['POST'])
+def release_slot():
+    """Cancel a reservation and return its slots to the hub"""
+    try:
+        req_data = request.get_json(silent=True) or {}
+        reservation = get_slot_book().release(req_data.get('reservation_id'))
+        if reservation is None:
+            return jsonify({'status': 'error', 'message': 'Reservation not found'}), 404
+        return jsonify({'status': 'success', 'data': reservation})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+# ============================================================================
+# 12. DATA QUALITY
+# ============================================================================
+
+@api.route('/api/quality', methods=['GET'])
+def get_quality():
+    """Validation totals, broken rules and quarantined row counts for every dataset"""
+    try:
+        # The report covers every dataset, so load any that are still pending
+        for name in TABLE_FILES:
+            data.get(name)
+        report = quality.report()
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'tables': report,
+                'summary': {
+                    'rows_checked': sum(table['rows_checked'] for table in report.values()),
+                    'rows_rejected': sum(table['rows_rejected'] for table in report.values()),
+                    'quarantined': sum(table['quarantined'] for table in report.values())
+                },
+                'version': data_version
+            }
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@api.route('/api/quality/<table>', methods=['GET'])
+def get_quarantine(table):
+    """Quarantined rows of one dataset, newest first, filterable by issue (e.g. to_hub_id:unknown_hub)"""
+    try:
+        if table not in TABLE_FILES:
+            return jsonify({'status': 'error', 'message': f'Unknown dataset: {table}'}), 404
+        data.get(table)
+        limit = request.args.get('limit', 100, type=int)
+        rows = quality.rows(table, issue=request.args.get('issue'), limit=limit)
+        return jsonify({
+            'status': 'success',
+            'data': {'table': table, 'rows': rows, 'count': len(rows)}
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+# ============================================================================
+# APPLICATION FACTORY
+# ============================================================================
+
+def create_app(prewarm_data=None):
+    """Build the Flask app without reading any data; datasets and the model load on demand.
+    Set prewarm_data (or PREWARM=1) to load them on a background thread right away.
+    """
+    global data_version, data_updated_at, data_token
+    if data_version == 0:
+        header = snapshots.header() if snapshots is not None else None
+        # Join the shared snapshot if another worker already published one
+        data_version = header['version'] if header else 1
+        data_updated_at = datetime.now(timezone.utc)
+        data_token = header['token'] if header else _files_fingerprint()
+        if header:
+            _restore_quality(header)
+
+    # Configure Flask with absolute static folder path
+    flask_app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path='')
+    # Enable CORS for frontend communication, except on the write endpoints
+    CORS(flask_app, resources={rf'^(?!{ADMIN_ROUTES}).*': {}})
+    if snapshots is not None:
+        # Registered before the compressor so ETags are checked against the followed snapshot
+        flask_app.before_request(_follow_snapshot)
+    # gzip/br/zstd + ETag/Last-Modified tied to the dataset snapshot token
+    ResponseCompressor(flask_app, token_getter=lambda: data_token, updated_getter=lambda: data_updated_at)
+    flask_app.register_blueprint(api)
+
+    if prewarm_data is None:
+        prewarm_data = os.environ.get('PREWARM') == '1'
+    if prewarm_data:
+        prewarm()
+    return flask_app
+
+app = create_app()
+
 # ============================================================================
 # RUN SERVER
 # ============================================================================
@@ -551,6 +1618,7 @@ if __name__ == '__main__':
     print("   - Frontend is served at the root URL.")
     print("\n📚 Available endpoints:")
     print("   GET  /api                   - Health check")
+    print("   GET  /api/ready             - Per-resource readiness")
     print("   GET  /api/overview          - Dashboard overview")
     print("   GET  /api/movements         - Vaccine movements")
     print("   POST /api/wastage/predict   - Wastage prediction")
@@ -560,6 +1628,21 @@ if __name__ == '__main__':
     print("   GET  /api/insights          - Smart insights")
     print("   GET  /api/hubs              - All hubs")
     print("   GET  /api/hubs/<hub_id>     - Hub details")
+    print("   GET  /api/stream            - Live deltas (Server-Sent Events)")
+    print("   POST /api/reload            - Reload datasets from CSV")
+    print("   POST /api/ingest/<table>    - Upsert dataset records")
+    print("   GET  /api/cache/stats       - Cache hit/miss statistics")
+    print("   GET  /api/citizens/<id>/doses - Citizen dose history")
+    print("   GET  /api/hubs/<id>/vaccinations/daily - Per-hub daily counts")
+    print("   GET  /api/anomalies         - Cold-chain & wastage anomalies")
+    print("   GET  /api/slots             - Dose slot availability per hub")
+    print("   POST /api/slots/reserve     - Reserve dose slots")
+    print("   POST /api/slots/release     - Release a reservation")
+    print("   GET  /api/quality           - Data-quality report per dataset")
+    print("   GET  /api/quality/<table>   - Quarantined rows of a dataset")
     print("\n" + "="*60 + "\n")
     
-    app.run(debug=True, host='0.0.0.0', port=5001)
+    # The debug reloader re-imports this file in a child process; only warm up there
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        prewarm()
+    app.run(debug=True, host='0.0.0.0', port=5001, threaded=True)
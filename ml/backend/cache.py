@@ -0,0 +1,218 @@
+"""
+Caching Primitives for the E-Vaccination Dashboard API
+Size-bounded LRU, a shared file-backed tier and the result cache built on both
+"""
+
+from collections import OrderedDict
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+class LRUCache:
+    """Least-recently-used cache bounded by the total byte size of its values."""
+
+    def __init__(self, max_bytes, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        """Store a value with its size in bytes; values larger than the whole cache are skipped."""
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes or (self.max_entries and len(self._entries) > self.max_entries):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+class SharedFileCache:
+    """File-backed cache tier shared by every worker process on the same host.
+
+    Each entry is one pickle file named after its snapshot token and key hash; writes are
+    atomic (temp file + rename) so concurrent workers never read a partial entry.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, token, digest):
+        return os.path.join(self.directory, f'{token}-{digest}.pkl')
+
+    def get(self, token, digest):
+        """Return (value, pickled size) or None on a miss."""
+        try:
+            with open(self._path(token, digest), 'rb') as f:
+                payload = f.read()
+            value = pickle.loads(payload)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value, len(payload)
+
+    def put(self, token, digest, payload):
+        """Store already-pickled bytes, then trim the directory back under max_bytes."""
+        if len(payload) > self.max_bytes:
+            return False
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, self._path(token, digest))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        self._evict()
+        return True
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pkl'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                self.evictions += 1
+            except OSError:
+                pass
+            total -= size
+
+    def invalidate(self, keep_token=None):
+        """Drop every entry that doesn't belong to keep_token."""
+        for _, _, name in self._entries():
+            if keep_token is None or not name.startswith(f'{keep_token}-'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def stats(self):
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            'directory': self.directory,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+def normalize_params(params):
+    """Canonical, hashable form of query parameters: blanks dropped, strings stripped, keys sorted."""
+    normalized = []
+    for name, value in params.items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            continue
+        normalized.append((name, value))
+    return tuple(sorted(normalized))
+
+class ResultCache:
+    """Two-tier cache for computed endpoint results keyed on (namespace, normalized params, snapshot token).
+
+    Tier 1 is an in-process LRUCache bounded by pickled size; tier 2 is an optional
+    SharedFileCache so workers on one host reuse each other's results.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, shared_dir=None, shared_max_bytes=256 * 1024 * 1024):
+        self.local = LRUCache(max_bytes)
+        self.shared = SharedFileCache(shared_dir, shared_max_bytes) if shared_dir else None
+
+    def get_or_compute(self, namespace, params, token, compute):
+        key = (namespace, normalize_params(params), token)
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        digest = hashlib.sha1(repr(key[:2]).encode()).hexdigest()
+        if self.shared is not None:
+            entry = self.shared.get(token, digest)
+            if entry is not None:
+                value, size = entry
+                self.local.put(key, value, size)
+                return value
+
+        value = compute()
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self.local.put(key, value, len(payload))
+        if self.shared is not None:
+            self.shared.put(token, digest, payload)
+        return value
+
+    def invalidate(self, token=None):
+        """Forget results computed against any snapshot other than token."""
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.invalidate(keep_token=token)
+
+    def stats(self):
+        return {
+            'local': self.local.stats(),
+            'shared': self.shared.stats() if self.shared is not None else None,
+        }
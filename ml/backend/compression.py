@@ -0,0 +1,204 @@
+"""
+Response Compression & Conditional Caching Middleware
+Content-negotiated gzip/brotli/zstd, snapshot-versioned ETag/Last-Modified and per-route Cache-Control
+"""
+
+from email.utils import format_datetime, parsedate_to_datetime
+import gzip
+
+from flask import Response, g, request
+
+from cache import LRUCache
+
+# Optional codecs: only advertised when the package is installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Cache-Control per route rule; anything not listed gets DEFAULT_CACHE_CONTROL.
+# "no-cache" still lets clients store the body, but they must revalidate with the ETag.
+DEFAULT_CACHE_CONTROL = 'no-cache'
+CACHE_CONTROL_POLICIES = {
+    '/api': 'no-store',
+    '/api/overview': 'no-cache',
+    '/api/movements': 'no-cache',
+    '/api/insights': 'no-cache',
+    '/api/hubs': 'public, max-age=60, stale-while-revalidate=300',
+    '/api/hubs/<hub_id>': 'public, max-age=60, stale-while-revalidate=300',
+    '/api/coverage': 'public, max-age=300',
+    '/api/demographics': 'public, max-age=300',
+    '/api/wastage/stats': 'public, max-age=300',
+}
+
+# Routes that must never be buffered, compressed or cached
+EXCLUDED_RULES = {'/api/stream', '/api/cache/stats', '/api/ready', '/api/slots',
+                  '/api/quality', '/api/quality/<table>'}
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript'}
+
+def _compress_gzip(body):
+    return gzip.compress(body, compresslevel=6)
+
+def _compress_brotli(body):
+    return brotli.compress(body, quality=5)
+
+def _compress_zstd(body):
+    return zstandard.ZstdCompressor(level=3).compress(body)
+
+def available_encodings():
+    """Supported codecs in server preference order."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append(('zstd', _compress_zstd))
+    if brotli is not None:
+        encodings.append(('br', _compress_brotli))
+    encodings.append(('gzip', _compress_gzip))
+    return encodings
+
+def parse_accept_encoding(header):
+    """Return {coding: q} from an Accept-Encoding header."""
+    accepted = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+class ResponseCompressor:
+    """Flask middleware adding compression, validators and a compressed-body LRU to /api GET routes."""
+
+    def __init__(self, app=None, token_getter=None, updated_getter=None,
+                 min_size=1024, cache_bytes=32 * 1024 * 1024, policies=None):
+        # The snapshot token names the data a response was built from, identically in every worker
+        self.token_getter = token_getter or (lambda: '0')
+        self.updated_getter = updated_getter
+        self.min_size = min_size
+        self.policies = dict(CACHE_CONTROL_POLICIES, **(policies or {}))
+        self.encodings = available_encodings()
+        self.bodies = LRUCache(cache_bytes)
+        self._cached_token = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.extensions['response_compressor'] = self
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _applies(self):
+        rule = request.url_rule.rule if request.url_rule else None
+        return (
+            request.method in ('GET', 'HEAD')
+            and rule is not None
+            and rule.startswith('/api')
+            and rule not in EXCLUDED_RULES
+        )
+
+    def _choose_encoding(self):
+        accepted = parse_accept_encoding(request.headers.get('Accept-Encoding'))
+        wildcard = accepted.get('*', 0.0)
+        for name, compress in self.encodings:
+            if accepted.get(name, wildcard) > 0:
+                return name, compress
+        return 'identity', None
+
+    def _validators(self, token):
+        headers = {
+            'ETag': f'W/"{token}"',
+            'Cache-Control': self.policies.get(request.url_rule.rule, DEFAULT_CACHE_CONTROL),
+            'Vary': 'Accept-Encoding',
+        }
+        updated = self.updated_getter() if self.updated_getter else None
+        if updated is not None:
+            headers['Last-Modified'] = format_datetime(updated, usegmt=True)
+        return headers
+
+    def _not_modified(self, token):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            tags = {tag.strip() for tag in if_none_match.split(',')}
+            return '*' in tags or f'W/"{token}"' in tags or f'"{token}"' in tags
+        if_modified_since = request.headers.get('If-Modified-Since')
+        updated = self.updated_getter() if self.updated_getter else None
+        if if_modified_since and updated is not None:
+            try:
+                return updated.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    # ------------------------------------------------------------------
+    # Request hooks
+    # ------------------------------------------------------------------
+
+    def _before_request(self):
+        if not self._applies():
+            return None
+        token = self.token_getter()
+        if token != self._cached_token:
+            # Bodies from older snapshots can never be served again
+            self.bodies.clear()
+            self._cached_token = token
+        g.snapshot_token = token
+
+        # Only a path that answered 200 for this snapshot is cached, so a 304 can't mask a 404;
+        # uncached requests are revalidated in _after_request once the view has answered
+        requested, _ = self._choose_encoding()
+        cached = self.bodies.get((request.full_path, token, requested))
+        if cached is None:
+            return None
+        g.compression_handled = True
+        if self._not_modified(token):
+            return Response(status=304, headers=self._validators(token))
+        body, mimetype, encoding = cached
+        response = Response(body, status=200, mimetype=mimetype, headers=self._validators(token))
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _after_request(self, response):
+        if g.pop('compression_handled', False) or not self._applies():
+            return response
+        token = g.get('snapshot_token', self.token_getter())
+        if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+            return response
+
+        validators = self._validators(token)
+        response.vary.add(validators.pop('Vary'))
+        response.headers.update(validators)
+        if 'Content-Encoding' in response.headers:
+            return response
+
+        body = response.get_data()
+        requested, compress = self._choose_encoding()
+        encoding = 'identity'
+        if compress is not None and response.mimetype in COMPRESSIBLE_MIMETYPES and len(body) >= self.min_size:
+            body = compress(body)
+            encoding = requested
+            response.set_data(body)
+            response.headers['Content-Encoding'] = encoding
+
+        # Only cache when the snapshot didn't change while the handler ran
+        if token == self.token_getter():
+            self.bodies.put((request.full_path, token, requested), (body, response.mimetype, encoding), len(body))
+        if self._not_modified(token):
+            return Response(status=304, headers=self._validators(token))
+        return response
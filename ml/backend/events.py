@@ -0,0 +1,180 @@
+"""
+Live Event Push for the E-Vaccination Dashboard
+Computes deltas between dataset snapshots and fans them out to Server-Sent Events subscribers
+"""
+
+from collections import deque
+from datetime import datetime
+import itertools
+import json
+import queue
+import threading
+
+# Columns compared when deciding whether an inventory row changed
+INVENTORY_QUANTITY_COLUMNS = ['quantity_received', 'quantity_remaining', 'quantity_wasted', 'quantity_administered']
+
+# ============================================================================
+# SNAPSHOT DIFFING
+# ============================================================================
+
+def _hub_divisions(hubs):
+    """Map hub_id -> division from the hubs master table (empty if unavailable)."""
+    if hubs is None or 'division' not in hubs:
+        return {}
+    return dict(zip(hubs['hub_id'], hubs['division']))
+
+def diff_movements(old, new, hubs=None):
+    """Return events for transfers that changed status or appeared since the previous snapshot."""
+    divisions = _hub_divisions(hubs)
+    merged = new.merge(old[['transfer_id', 'status']], on='transfer_id', how='left', suffixes=('', '_previous'))
+    added = merged[merged['status_previous'].isna()]
+    changed = merged[merged['status_previous'].notna() & (merged['status'] != merged['status_previous'])]
+
+    events = []
+    for event_type, rows in (('movement_added', added), ('movement_status', changed)):
+        for row in rows.to_dict('records'):
+            hub_ids = [row['from_hub_id'], row['to_hub_id']]
+            payload = {
+                'transfer_id': row['transfer_id'],
+                'from_hub_id': row['from_hub_id'],
+                'to_hub_id': row['to_hub_id'],
+                'vaccine_name': row.get('vaccine_name'),
+                'quantity_transferred': int(row['quantity_transferred']),
+                'status': row['status'],
+            }
+            if event_type == 'movement_status':
+                payload['previous_status'] = row['status_previous']
+            events.append(make_event(event_type, payload, hub_ids, [divisions.get(h) for h in hub_ids]))
+    return events
+
+def diff_inventory(old, new):
+    """Return events for inventory rows whose quantities changed or that were newly received."""
+    columns = [c for c in INVENTORY_QUANTITY_COLUMNS if c in new and c in old]
+    merged = new.merge(old[['inventory_id'] + columns], on='inventory_id', how='left', suffixes=('', '_previous'), indicator=True)
+    is_new = merged['_merge'] == 'left_only'
+    is_changed = is_new.copy()
+    for column in columns:
+        is_changed |= merged[column] != merged[f'{column}_previous']
+
+    events = []
+    for row in merged[is_changed].to_dict('records'):
+        payload = {
+            'inventory_id': row['inventory_id'],
+            'hub_id': row['hub_id'],
+            'vaccine_name': row.get('vaccine_name'),
+            'vaccine_batch_id': row.get('vaccine_batch_id'),
+        }
+        for column in columns:
+            payload[column] = int(row[column])
+            if row['_merge'] == 'both':
+                payload[f'{column}_delta'] = int(row[column] - row[f'{column}_previous'])
+        events.append(make_event('inventory', payload, [row['hub_id']], [row.get('division')]))
+    return events
+
+def diff_insights(old, new):
+    """Return events for insights that are new or whose message changed."""
+    previous = {insight['title']: insight['message'] for insight in old or []}
+    return [
+        make_event('insight', insight)
+        for insight in new
+        if previous.get(insight['title']) != insight['message']
+    ]
+
+def make_event(event_type, payload, hub_ids=None, divisions=None):
+    """Build an event dict; events without hubs/divisions are delivered to every subscriber."""
+    return {
+        'type': event_type,
+        'hub_ids': [h for h in (hub_ids or []) if h],
+        'divisions': sorted({d for d in (divisions or []) if d}),
+        'data': payload,
+    }
+
+# ============================================================================
+# SUBSCRIPTIONS & BROKER
+# ============================================================================
+
+class Subscription:
+    """A single client's filtered, bounded event queue."""
+
+    def __init__(self, hub_ids=None, divisions=None, event_types=None, maxsize=256):
+        self.hub_ids = set(hub_ids or [])
+        self.divisions = set(divisions or [])
+        self.event_types = set(event_types or [])
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def matches(self, event):
+        if self.event_types and event['type'] not in self.event_types:
+            return False
+        if self.hub_ids and event['hub_ids'] and not self.hub_ids.intersection(event['hub_ids']):
+            return False
+        if self.divisions and event['divisions'] and not self.divisions.intersection(event['divisions']):
+            return False
+        return True
+
+    def offer(self, event):
+        """Enqueue without blocking the publisher; slow clients lose their oldest pending event."""
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+class EventBroker:
+    """Fan-out hub for dataset delta events with a short replay history."""
+
+    def __init__(self, history_size=1000):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._ids = itertools.count(1)
+
+    def subscribe(self, hub_ids=None, divisions=None, event_types=None, last_event_id=None):
+        subscription = Subscription(hub_ids, divisions, event_types)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._history:
+                    if event['id'] > last_event_id and subscription.matches(event):
+                        subscription.offer(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def publish(self, events, version):
+        """Stamp events with an id and snapshot version, then deliver them to matching subscribers."""
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            for event in events:
+                event['id'] = next(self._ids)
+                event['version'] = version
+                event['timestamp'] = timestamp
+                self._history.append(event)
+                for subscription in self._subscribers:
+                    if subscription.matches(event):
+                        subscription.offer(event)
+        return len(events)
+
+    def stream(self, subscription, heartbeat=15.0):
+        """Yield SSE-formatted frames for a subscription until the client disconnects."""
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            self.unsubscribe(subscription)
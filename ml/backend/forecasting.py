@@ -0,0 +1,226 @@
+"""
+Multi-Horizon Wastage Forecasting
+Per-hub rolling history of the model's input features, kept up to date incrementally from
+daily_metrics, and a batch forecaster that scores every (hub, day) pair of a horizon in one
+vectorized pass. Prediction intervals come from the spread of the forest's per-tree predictions.
+"""
+
+from lazy import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+FORECAST_HORIZONS = (7, 30, 90)
+QUANTILES = (0.1, 0.5, 0.9)
+# Model inputs summarized over each hub's most recent days
+NUMERIC_FEATURES = ('opening_stock', 'received_quantity', 'administered_quantity',
+                    'utilization_rate', 'temperature_avg', 'power_outage_hours')
+# Fallback when no trained model is loaded: recent average, weekends slightly higher
+WEEKEND_FACTOR = 1.2
+
+# ============================================================================
+# PER-HUB HISTORY
+# ============================================================================
+
+class HubHistory:
+    """Ring buffer of each hub's last `window` daily rows, stored as (hubs x window) arrays.
+
+    Rows are absorbed in date order; a hub ignores days it has already seen, so re-sent or
+    late history never double counts. Updating costs O(new rows), never a rescan of history.
+    """
+
+    def __init__(self, window=7):
+        self.window = window
+        self.hubs = {}
+        self.hub_names = {}
+        self.hub_types = []
+        self.regions = []
+        self.weather_codes = {}
+        self.values = np.full((0, window, len(NUMERIC_FEATURES)), np.nan)
+        self.wastage = np.full((0, window), np.nan)
+        self.weather = np.full((0, window), -1, dtype=np.int64)
+        self.filled = np.zeros(0, dtype=np.int64)
+        self.last_day = np.zeros(0, dtype='datetime64[D]')
+        # Holiday share per weekday (Monday=0), used for future dates
+        self.holidays = np.zeros((7, 2), dtype=np.int64)
+
+    def _rows(self, hub_ids):
+        new = [hub for hub in pd.unique(hub_ids) if hub not in self.hubs]
+        if new:
+            for hub in new:
+                self.hubs[hub] = len(self.hubs)
+            grow = len(new)
+            self.hub_types += [None] * grow
+            self.regions += [None] * grow
+            self.values = np.concatenate([self.values, np.full((grow, self.window, len(NUMERIC_FEATURES)), np.nan)])
+            self.wastage = np.concatenate([self.wastage, np.full((grow, self.window), np.nan)])
+            self.weather = np.concatenate([self.weather, np.full((grow, self.window), -1, dtype=np.int64)])
+            self.filled = np.concatenate([self.filled, np.zeros(grow, dtype=np.int64)])
+            self.last_day = np.concatenate([self.last_day, np.full(grow, np.datetime64('NaT'), dtype='datetime64[D]')])
+        return np.array([self.hubs[hub] for hub in hub_ids], dtype=np.int64)
+
+    def update(self, metrics):
+        """Absorb a batch of daily_metrics rows (any order, any number of days)."""
+        if len(metrics) == 0:
+            return self
+        # Columns a batch doesn't carry are treated as not reported
+        missing = [column for column in NUMERIC_FEATURES + ('wastage_rate', 'weather_condition') if column not in metrics]
+        if missing:
+            metrics = metrics.assign(**{column: np.nan for column in missing})
+        frame = metrics.assign(_day=pd.to_datetime(metrics['date']).to_numpy(dtype='datetime64[D]'))
+        frame = frame.sort_values('_day', kind='stable').drop_duplicates(['hub_id', '_day'], keep='last')
+        rows = self._rows(frame['hub_id'].to_numpy())
+        last = self.last_day[rows]
+        fresh = np.isnat(last) | (frame['_day'].to_numpy() > last)
+        frame, rows = frame[fresh], rows[fresh]
+        if len(frame) == 0:
+            return self
+
+        weekdays = frame['_day'].dt.dayofweek.to_numpy()
+        if 'is_holiday' in frame:
+            holiday = frame['is_holiday'].astype(str).str.lower().isin(['true', '1']).to_numpy()
+            np.add.at(self.holidays, (weekdays, holiday.astype(np.int64)), 1)
+
+        # Static attributes follow the hub's latest row
+        latest = pd.Series(np.arange(len(frame))).groupby(rows).last()
+        for row, position in latest.items():
+            record = frame.iloc[position]
+            self.hub_types[row] = record.get('hub_type')
+            self.regions[row] = record.get('region')
+            if 'hub_name' in record:
+                self.hub_names[frame['hub_id'].iloc[position]] = record['hub_name']
+
+        # Only each hub's newest `window` rows can survive, so write just those into the ring
+        rank_from_end = pd.Series(rows).groupby(rows).cumcount(ascending=False).to_numpy()
+        keep = rank_from_end < self.window
+        counts = np.bincount(rows, minlength=len(self.filled))
+        end = self.filled + counts
+        slots = (end[rows] - 1 - rank_from_end) % self.window
+
+        numeric = frame[list(NUMERIC_FEATURES)].to_numpy(dtype=np.float64)
+        local_codes, names = pd.factorize(frame['weather_condition'].astype(str))
+        mapping = np.array([self.weather_codes.setdefault(name, len(self.weather_codes)) for name in names], dtype=np.int64)
+        weather = mapping[local_codes]
+        self.values[rows[keep], slots[keep]] = numeric[keep]
+        self.wastage[rows[keep], slots[keep]] = frame['wastage_rate'].to_numpy(dtype=np.float64)[keep]
+        self.weather[rows[keep], slots[keep]] = weather[keep]
+        self.filled = end
+        # Rows are in date order, so each hub's last row holds its newest day
+        newest = pd.Series(frame['_day'].to_numpy(dtype='datetime64[D]')).groupby(rows).last()
+        self.last_day[newest.index.to_numpy()] = newest.to_numpy(dtype='datetime64[D]')
+        return self
+
+    def features(self, rows):
+        """Recent mean of each numeric feature plus the most common recent weather, per hub row."""
+        values = self.values[rows]
+        present = ~np.isnan(values)
+        means = np.where(present, values, 0.0).sum(axis=1) / np.maximum(present.sum(axis=1), 1)
+        weather = self.weather[rows]
+        counts = (weather[:, :, None] == np.arange(max(len(self.weather_codes), 1))).sum(axis=1)
+        names = np.array(list(self.weather_codes) or [''], dtype=object)
+        return means, names[counts.argmax(axis=1)]
+
+    def holiday_weekdays(self):
+        """Boolean per weekday: whether that weekday has mostly been a holiday so far."""
+        return self.holidays[:, 1] > self.holidays[:, 0]
+
+# ============================================================================
+# FORECASTER
+# ============================================================================
+
+class WastageForecaster:
+    """Batch wastage forecasts over 7/30/90-day horizons with per-tree quantile intervals."""
+
+    def __init__(self, model_bundle=None, window=7):
+        self.model_bundle = model_bundle
+        self.history = HubHistory(window)
+
+    def update(self, metrics):
+        self.history.update(metrics)
+        return self
+
+    def _design_matrix(self, rows, dates):
+        """(hubs * days, features) matrix in the model's column order, hub-major."""
+        columns = self.model_bundle['feature_columns']
+        means, weather = self.history.features(rows)
+        n_hubs, n_days = len(rows), len(dates)
+        index = pd.DatetimeIndex(dates)
+        calendar = {
+            'day': index.day.to_numpy(),
+            'month': index.month.to_numpy(),
+            'day_of_week_num': index.dayofweek.to_numpy(),
+            'is_holiday': self.history.holiday_weekdays()[index.dayofweek.to_numpy()],
+        }
+        categories = {
+            'hub_type_': np.array(self.history.hub_types, dtype=object)[rows],
+            'region_': np.array(self.history.regions, dtype=object)[rows],
+            'weather_condition_': weather,
+        }
+        X = np.zeros((n_hubs, n_days, len(columns)), dtype=np.float32)
+        for c, column in enumerate(columns):
+            if column in NUMERIC_FEATURES:
+                X[:, :, c] = means[:, NUMERIC_FEATURES.index(column)][:, None]
+            elif column in calendar:
+                X[:, :, c] = calendar[column][None, :]
+            else:
+                for prefix, values in categories.items():
+                    if column.startswith(prefix):
+                        X[:, :, c] = (values == column[len(prefix):])[:, None]
+                        break
+        return X.reshape(n_hubs * n_days, len(columns))
+
+    def _tree_predictions(self, rows, dates):
+        """(trees, hubs, days) predictions; a non-ensemble model yields a single 'tree'."""
+        model = self.model_bundle['model']
+        X = self._design_matrix(rows, dates)
+        estimators = getattr(model, 'estimators_', None)
+        if estimators is None:
+            predictions = model.predict(X.astype(np.float64))[None, :]
+        else:
+            predictions = np.stack([tree.predict(X, check_input=False) for tree in estimators])
+        return predictions.reshape(len(predictions), len(rows), len(dates))
+
+    def _heuristic(self, rows, dates):
+        """(quantiles + mean, hubs, days) from each hub's recent wastage, without a model."""
+        recent = self.history.wastage[rows]
+        weekend = np.where(pd.DatetimeIndex(dates).dayofweek.to_numpy() >= 5, WEEKEND_FACTOR, 1.0)
+        center = np.nanmean(recent, axis=1)[:, None] * weekend
+        spread = np.nanquantile(recent, QUANTILES, axis=1)[:, :, None] * weekend
+        return center, spread
+
+    def forecast(self, hub_id=None, horizon=7, start=None):
+        """Forecast wastage_rate for the `horizon` days after `start` (default today).
+
+        With hub_id=None the series is the mean over every hub, aggregated per tree before
+        the quantiles are taken so the interval reflects the network-wide average.
+        Raises KeyError for a hub with no history and ValueError for an unsupported horizon.
+        """
+        if horizon not in FORECAST_HORIZONS:
+            raise ValueError(f'horizon must be one of {", ".join(map(str, FORECAST_HORIZONS))}')
+        if hub_id is not None and hub_id not in self.history.hubs:
+            raise KeyError(hub_id)
+        rows = (np.array([self.history.hubs[hub_id]]) if hub_id is not None
+                else np.arange(len(self.history.hubs)))
+        start = pd.Timestamp(start or pd.Timestamp.now()).normalize()
+        dates = pd.date_range(start + pd.Timedelta(days=1), periods=horizon, freq='D')
+
+        if self.model_bundle is not None:
+            trees = self._tree_predictions(rows, dates).mean(axis=1)
+            center = trees.mean(axis=0)
+            lower, median, upper = np.quantile(trees, QUANTILES, axis=0)
+        else:
+            center, spread = self._heuristic(rows, dates)
+            center = np.nanmean(center, axis=0)
+            lower, median, upper = np.nanmean(spread, axis=1)
+
+        return [
+            {
+                'date': date.strftime('%Y-%m-%d'),
+                'predicted_wastage_rate': round(float(center[i]), 2),
+                'median': round(float(median[i]), 2),
+                'lower': round(float(lower[i]), 2),
+                'upper': round(float(upper[i]), 2),
+                'day_of_week': date.strftime('%A'),
+            }
+            for i, date in enumerate(dates)
+        ]
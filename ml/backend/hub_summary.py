@@ -0,0 +1,142 @@
+"""
+Hub Summary Table
+One maintained row per hub with inventory totals, utilization (overall and rolling 7/30-day)
+and the last reported date. Ingested inventory and metric rows are applied as deltas, so
+/api/hubs never re-joins or re-aggregates the source tables.
+"""
+
+import threading
+
+from lazy import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+INVENTORY_COLUMNS = ('quantity_remaining', 'quantity_wasted', 'quantity_administered')
+ROLLING_WINDOWS = (7, 30)
+
+class HubSummary:
+    """Per-hub aggregates stored as arrays indexed by hub row.
+
+    Rolling utilization keeps the last max(ROLLING_WINDOWS) days per hub in a ring keyed by
+    day number, so corrections to an existing day overwrite it in place. Windows end at each
+    hub's last reported day.
+    """
+
+    def __init__(self, hubs, window=max(ROLLING_WINDOWS)):
+        self.window = window
+        self.hubs = {}
+        self.inventory = np.zeros((0, len(INVENTORY_COLUMNS)))
+        self.utilization_sum = np.zeros(0)
+        self.utilization_count = np.zeros(0, dtype=np.int64)
+        self.recent = np.full((0, window), np.nan)
+        self.recent_day = np.full((0, window), np.datetime64('NaT'), dtype='datetime64[D]')
+        self.last_day = np.zeros(0, dtype='datetime64[D]')
+        self.hub_table = None
+        self._projection = None
+        self._lock = threading.Lock()
+        self.set_hubs(hubs)
+
+    def _rows(self, hub_ids):
+        new = [hub for hub in pd.unique(np.asarray(hub_ids, dtype=object)) if hub not in self.hubs]
+        if new:
+            for hub in new:
+                self.hubs[hub] = len(self.hubs)
+            grow = len(new)
+            self.inventory = np.vstack([self.inventory, np.zeros((grow, len(INVENTORY_COLUMNS)))])
+            self.utilization_sum = np.concatenate([self.utilization_sum, np.zeros(grow)])
+            self.utilization_count = np.concatenate([self.utilization_count, np.zeros(grow, dtype=np.int64)])
+            self.recent = np.vstack([self.recent, np.full((grow, self.window), np.nan)])
+            self.recent_day = np.vstack([self.recent_day, np.full((grow, self.window), np.datetime64('NaT'), dtype='datetime64[D]')])
+            self.last_day = np.concatenate([self.last_day, np.full(grow, np.datetime64('NaT'), dtype='datetime64[D]')])
+        return np.array([self.hubs[hub] for hub in hub_ids], dtype=np.int64)
+
+    def set_hubs(self, hubs):
+        """Replace the hub attributes (hubs_master rows) the summary is projected onto."""
+        with self._lock:
+            self._rows(hubs['hub_id'].to_numpy())
+            self.hub_table = hubs.copy()
+            self._projection = None
+        return self
+
+    def apply_inventory(self, removed=None, added=None):
+        """Subtract replaced inventory rows and add new ones."""
+        with self._lock:
+            for frame, sign in ((removed, -1.0), (added, 1.0)):
+                if frame is None or len(frame) == 0:
+                    continue
+                rows = self._rows(frame['hub_id'].to_numpy())
+                values = frame[list(INVENTORY_COLUMNS)].fillna(0).to_numpy(dtype=np.float64)
+                np.add.at(self.inventory, rows, sign * values)
+            self._projection = None
+        return self
+
+    def apply_metrics(self, removed=None, added=None):
+        """Subtract replaced daily_metrics rows and add new ones.
+        A batch without utilization_rate counts as unreported, like a missing value.
+        """
+        if removed is not None and 'utilization_rate' not in removed:
+            removed = removed.assign(utilization_rate=np.nan)
+        if added is not None and 'utilization_rate' not in added:
+            added = added.assign(utilization_rate=np.nan)
+        with self._lock:
+            if removed is not None and len(removed):
+                rows = self._rows(removed['hub_id'].to_numpy())
+                values = removed['utilization_rate'].to_numpy(dtype=np.float64)
+                present = ~np.isnan(values)
+                np.add.at(self.utilization_sum, rows[present], -values[present])
+                np.add.at(self.utilization_count, rows[present], -1)
+                days = pd.to_datetime(removed['date']).to_numpy(dtype='datetime64[D]')
+                slots = days.astype(np.int64) % self.window
+                held = self.recent_day[rows, slots] == days
+                self.recent[rows[held], slots[held]] = np.nan
+                self.recent_day[rows[held], slots[held]] = np.datetime64('NaT')
+
+            if added is not None and len(added):
+                added = added.assign(_day=pd.to_datetime(added['date']).to_numpy(dtype='datetime64[D]'))
+                added = added.sort_values('_day', kind='stable')
+                rows = self._rows(added['hub_id'].to_numpy())
+                values = added['utilization_rate'].to_numpy(dtype=np.float64)
+                present = ~np.isnan(values)
+                np.add.at(self.utilization_sum, rows[present], values[present])
+                np.add.at(self.utilization_count, rows[present], 1)
+                # A slot holds the newest day with its day number mod window; older days are out of range anyway
+                days = added['_day'].to_numpy(dtype='datetime64[D]')
+                slots = days.astype(np.int64) % self.window
+                current = self.recent_day[rows, slots]
+                newer = np.isnat(current) | (days >= current)
+                self.recent[rows[newer], slots[newer]] = values[newer]
+                self.recent_day[rows[newer], slots[newer]] = days[newer]
+                newest = pd.Series(days).groupby(rows).max()
+                hub_rows = newest.index.to_numpy()
+                latest = newest.to_numpy(dtype='datetime64[D]')
+                previous = self.last_day[hub_rows]
+                self.last_day[hub_rows] = np.where(np.isnat(previous) | (latest > previous), latest, previous)
+            self._projection = None
+        return self
+
+    def _rolling(self, days):
+        start = (self.last_day - np.timedelta64(days - 1, 'D'))[:, None]
+        inside = ~np.isnat(self.recent_day) & (self.recent_day >= start) & ~np.isnan(self.recent)
+        totals = np.where(inside, self.recent, 0.0).sum(axis=1)
+        counts = inside.sum(axis=1)
+        return np.where(counts > 0, totals / np.maximum(counts, 1), np.nan)
+
+    def projection(self):
+        """DataFrame of hubs_master columns plus the maintained aggregates (rebuilt only after a change)."""
+        with self._lock:
+            if self._projection is None:
+                table = self.hub_table.copy()
+                rows = np.array([self.hubs[hub] for hub in table['hub_id']], dtype=np.int64)
+                for c, column in enumerate(INVENTORY_COLUMNS):
+                    table[column] = self.inventory[rows, c].round().astype(np.int64)
+                counts = self.utilization_count[rows]
+                table['utilization_rate'] = np.where(
+                    counts > 0, self.utilization_sum[rows] / np.maximum(counts, 1), np.nan)
+                for days in ROLLING_WINDOWS:
+                    table[f'utilization_{days}d'] = self._rolling(days)[rows].round(2)
+                last = self.last_day[rows]
+                table['last_reported_date'] = np.where(np.isnat(last), None, last.astype(str))
+                # jsonify can't encode NaN; hubs without metrics report null
+                self._projection = table.astype(object).where(table.notna(), None)
+            return self._projection
@@ -0,0 +1,21 @@
+"""
+Deferred Imports for the E-Vaccination Dashboard API
+Heavy libraries (pandas, numpy, sklearn) are only imported on first attribute access
+"""
+
+import importlib.util
+import sys
+
+def lazy_import(name):
+    """Return a module proxy that performs the real import the first time it is used."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
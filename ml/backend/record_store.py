@@ -0,0 +1,396 @@
+"""
+Vaccination Record Store
+Columnar, chunked on-disk copy of vaccination_records.csv sorted by citizen_id, with a
+(hub_id, vaccination_date) count index. Chunks are memory-mapped, so lookups only touch
+the pages they need and the table never has to be fully resident in RAM.
+
+Build it once from the CSV (it is also rebuilt automatically when the CSV changes):
+    python record_store.py
+"""
+
+from bisect import bisect_right
+from contextlib import contextmanager
+import glob
+import json
+import os
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialized across processes
+    fcntl = None
+
+from lazy import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+FORMAT_VERSION = 2
+KEY_COLUMN = 'citizen_id'
+ID_COLUMN = 'vaccination_id'
+# High-cardinality strings stored as fixed-width bytes; other strings are dictionary-encoded
+BYTES_COLUMNS = ('citizen_id', 'vaccination_id')
+DATE_COLUMNS = ('vaccination_date',)
+EPOCH = '1970-01-01'
+# Missing integers, and missing booleans / dictionary strings (code -1), have no NaN of their own
+INT_MISSING = -(2 ** 63)
+
+# ============================================================================
+# ENCODING
+# ============================================================================
+
+# How each kind of column is parsed from the CSV, so every chunk is read the same way
+READ_DTYPES = {'bytes': str, 'date': str, 'bool': 'boolean', 'int': 'Int64', 'float': 'float64', 'string': str}
+
+def _column_kinds(frame):
+    """Storage kind of each column, decided once from the first rows of the CSV."""
+    kinds = {}
+    for column in frame.columns:
+        series = frame[column]
+        if column in BYTES_COLUMNS:
+            kinds[column] = 'bytes'
+        elif column in DATE_COLUMNS:
+            kinds[column] = 'date'
+        elif pd.api.types.is_bool_dtype(series) or pd.api.types.infer_dtype(series, skipna=True) == 'boolean':
+            kinds[column] = 'bool'
+        elif pd.api.types.is_integer_dtype(series):
+            kinds[column] = 'int'
+        elif pd.api.types.is_float_dtype(series):
+            kinds[column] = 'float'
+        else:
+            kinds[column] = 'string'
+    return kinds
+
+def _encode_chunk(frame, kinds, dictionaries):
+    """Encode one CSV chunk into {column: numpy array}, growing the string dictionaries in place."""
+    encoded = {}
+    for column, kind in kinds.items():
+        series = frame[column]
+        if kind == 'bytes':
+            encoded[column] = series.astype(str).str.encode('utf-8').to_numpy(dtype='S')
+        elif kind == 'date':
+            days = (pd.to_datetime(series) - pd.Timestamp(EPOCH)).dt.days
+            encoded[column] = days.to_numpy(dtype=np.int32)
+        elif kind == 'bool':
+            encoded[column] = np.where(series.isna(), -1, series.fillna(False).astype(bool)).astype(np.int8)
+        elif kind == 'int':
+            encoded[column] = series.astype('Int64').to_numpy(dtype=np.int64, na_value=INT_MISSING)
+        elif kind == 'float':
+            encoded[column] = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            values = dictionaries.setdefault(column, {})
+            local_codes, uniques = pd.factorize(series)
+            mapping = np.array([values.setdefault(str(value), len(values)) for value in uniques], dtype=np.int32)
+            encoded[column] = np.where(local_codes < 0, -1, mapping[local_codes] if len(mapping) else -1).astype(np.int32)
+    return encoded
+
+def _read_chunks(csv_path, chunk_rows):
+    """Yield (kinds, chunk) over the CSV, every chunk parsed with the column types of the first.
+    A value later in the file that doesn't fit its column's type raises ValueError."""
+    kinds = _column_kinds(pd.read_csv(csv_path, nrows=chunk_rows))
+    reader = pd.read_csv(csv_path, chunksize=chunk_rows, dtype={column: READ_DTYPES[kind] for column, kind in kinds.items()})
+    try:
+        for frame in reader:
+            if list(frame.columns) != list(kinds):
+                raise ValueError(f'{csv_path}: columns changed part-way through the file')
+            yield kinds, frame
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'{csv_path}: a value does not match the column types inferred from the first '
+                         f'{chunk_rows} rows: {e}') from e
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+@contextmanager
+def _build_lock(store_dir):
+    """Serialize builds of one store across threads and worker processes."""
+    with open(f'{store_dir}.lock', 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def build_store(csv_path, store_dir, chunk_rows=1_000_000, clean=None, clean_key=None):
+    """Build the store from a CSV with bounded memory: spill encoded chunks, sort on the key
+    column only, then gather rows into sorted output chunks.
+
+    clean, if given, filters each CSV chunk (e.g. data-quality validation) before it is stored;
+    clean_key identifies that filter, so a store built with different rules is seen as stale.
+    Rows sharing a vaccination_id keep the last one, as in the in-memory table.
+    """
+    with _build_lock(store_dir):
+        return _build(csv_path, store_dir, chunk_rows, clean, clean_key)
+
+def _build(csv_path, store_dir, chunk_rows, clean, clean_key):
+    # Holding the build lock, so work directories left by a crashed build can be removed
+    for stale in glob.glob(glob.escape(store_dir) + '.building.*'):
+        shutil.rmtree(stale, ignore_errors=True)
+    work_dir = f'{store_dir}.building.{os.getpid()}'
+    spill_dir = os.path.join(work_dir, 'spill')
+    os.makedirs(spill_dir)
+
+    # Pass 1: encode the CSV chunk by chunk into spill files (input order)
+    # Column types are fixed from the first chunk, so no column is stored with mixed encodings
+    dictionaries, widths, dtypes, spills, total, kinds = {}, {}, {}, [], 0, {}
+    for kinds, frame in _read_chunks(csv_path, chunk_rows):
+        if clean is not None:
+            frame = clean(frame)
+        encoded = _encode_chunk(frame, kinds, dictionaries)
+        path = os.path.join(spill_dir, f'{len(spills):05d}.npz')
+        np.savez(path, **encoded)
+        spills.append((path, len(frame)))
+        total += len(frame)
+        for column, array in encoded.items():
+            if array.dtype.kind != 'S' and dtypes.setdefault(column, array.dtype) != array.dtype:
+                raise ValueError(f'Column {column!r} encoded as {array.dtype} after {dtypes[column]}')
+            dtypes[column] = array.dtype
+            if array.dtype.kind == 'S':
+                widths[column] = max(widths.get(column, 1), array.dtype.itemsize)
+    columns = list(dtypes)
+
+    # Pass 2: consolidate each column into one memory-mapped array
+    full = {}
+    for column in columns:
+        dtype = f'S{widths[column]}' if column in widths else dtypes[column]
+        full[column] = np.lib.format.open_memmap(os.path.join(work_dir, f'{column}.npy'), mode='w+', dtype=dtype, shape=(total,))
+    offset = 0
+    for path, rows in spills:
+        with np.load(path) as spill:
+            for column in columns:
+                full[column][offset:offset + rows] = spill[column]
+        offset += rows
+    shutil.rmtree(spill_dir)
+
+    # Pass 3: drop all but the last row per vaccination_id, then order by citizen_id
+    # (only the id and key columns are held in memory)
+    kept = np.arange(total)
+    if ID_COLUMN in full and total:
+        _, last = np.unique(np.asarray(full[ID_COLUMN])[::-1], return_index=True)
+        kept = np.sort(total - 1 - last)
+    order = kept[np.argsort(np.asarray(full[KEY_COLUMN])[kept], kind='stable')]
+    total = len(order)
+
+    # Pass 4: write sorted, fixed-size chunks with a min/max zone map on the key
+    out_dir = os.path.join(work_dir, 'store')
+    os.makedirs(out_dir)
+    chunks = []
+    for number, start in enumerate(range(0, total, chunk_rows)):
+        rows = order[start:start + chunk_rows]
+        chunk_dir = os.path.join(out_dir, f'chunk_{number:05d}')
+        os.makedirs(chunk_dir)
+        for column in columns:
+            np.save(os.path.join(chunk_dir, f'{column}.npy'), full[column][rows])
+        keys = full[KEY_COLUMN][rows]
+        chunks.append({'rows': int(len(rows)), 'key_min': keys[0].decode(), 'key_max': keys[-1].decode()})
+
+    # Pass 5: (hub, day) count matrix for per-hub daily counts
+    hub_names = _decode_dictionary(dictionaries.get('hub_id', {}))
+    dates = np.asarray(full['vaccination_date'])[kept] if total else np.zeros(0, dtype=np.int32)
+    first_day = int(dates.min()) if total else 0
+    n_days = int(dates.max()) - first_day + 1 if total else 0
+    counts = np.zeros((len(hub_names), n_days), dtype=np.int32)
+    if total:
+        hubs = np.asarray(full['hub_id'])[kept]
+        known = hubs >= 0
+        np.add.at(counts, (hubs[known], (dates - first_day)[known]), 1)
+    np.save(os.path.join(out_dir, 'hub_day_counts.npy'), counts)
+
+    stat = os.stat(csv_path)
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'source': {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'clean_key': clean_key},
+        'rows': int(total),
+        'columns': {column: str(full[column].dtype) for column in columns},
+        'kinds': {column: kinds[column] for column in columns},
+        'dictionaries': {column: _decode_dictionary(values) for column, values in dictionaries.items()},
+        'chunks': chunks,
+        'first_day': first_day,
+    }
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    del full
+    old_dir = f'{store_dir}.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(store_dir):
+        os.rename(store_dir, old_dir)
+    os.rename(out_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return meta
+
+def _decode_dictionary(values):
+    decoded = [None] * len(values)
+    for value, code in values.items():
+        decoded[code] = value
+    return decoded
+
+def is_fresh(csv_path, store_dir, clean_key=None):
+    """True if the store exists and was built from the CSV as it is now, with the same filter."""
+    try:
+        with open(os.path.join(store_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        stat = os.stat(csv_path)
+    except (OSError, ValueError):
+        return False
+    return (
+        meta.get('format_version') == FORMAT_VERSION
+        and meta['source'] == {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'clean_key': clean_key}
+    )
+
+# ============================================================================
+# QUERY
+# ============================================================================
+
+class RecordStore:
+    """Read-only view over a built store plus an in-memory buffer of records ingested since.
+
+    The buffer holds one row per vaccination_id. A buffered record shadows the stored record with
+    the same id, which is left out of dose lookups and subtracted from the hub counts.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self._key_mins = [chunk['key_min'] for chunk in self.meta['chunks']]
+        self._codes = {column: {value: code for code, value in enumerate(values)}
+                       for column, values in self.meta['dictionaries'].items()}
+        self._counts = np.load(os.path.join(store_dir, 'hub_day_counts.npy'), mmap_mode='r')
+        self._pending = None
+        # Stored records replaced by buffered ones (only what the hub counts need)
+        self._shadowed = pd.DataFrame(columns=[ID_COLUMN, 'hub_id', 'vaccination_date'])
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open_or_build(cls, csv_path, store_dir, chunk_rows=1_000_000, clean=None, clean_key=None):
+        if not is_fresh(csv_path, store_dir, clean_key):
+            with _build_lock(store_dir):
+                # Another worker may have built it while this one waited for the lock
+                if not is_fresh(csv_path, store_dir, clean_key):
+                    _build(csv_path, store_dir, chunk_rows, clean, clean_key)
+        return cls(store_dir)
+
+    def __len__(self):
+        pending, shadowed = self._buffer()
+        return self.meta['rows'] - len(shadowed) + (len(pending) if pending is not None else 0)
+
+    def _column(self, chunk, column):
+        return np.load(os.path.join(self.store_dir, f'chunk_{chunk:05d}', f'{column}.npy'), mmap_mode='r')
+
+    def _decode(self, chunk, rows):
+        """Materialize a slice of one chunk as a DataFrame with the original column types."""
+        decoded = {}
+        for column, kind in self.meta['kinds'].items():
+            values = np.asarray(self._column(chunk, column)[rows])
+            if kind == 'bytes':
+                decoded[column] = np.char.decode(values, 'utf-8')
+            elif kind == 'date':
+                decoded[column] = (pd.Timestamp(EPOCH) + pd.to_timedelta(values, unit='D')).strftime('%Y-%m-%d')
+            elif kind == 'bool':
+                missing = values < 0
+                decoded[column] = np.where(missing, None, values == 1) if missing.any() else values == 1
+            elif kind == 'int':
+                missing = values == INT_MISSING
+                decoded[column] = np.where(missing, np.nan, values) if missing.any() else values
+            elif kind == 'string':
+                # Code -1 (missing) picks the trailing None
+                decoded[column] = np.append(np.asarray(self.meta['dictionaries'].get(column, []), dtype=object), None)[values]
+            else:
+                decoded[column] = values
+        return pd.DataFrame(decoded)
+
+    def _buffer(self):
+        with self._lock:
+            return self._pending, self._shadowed
+
+    def append(self, frame, replaced=None):
+        """Buffer newly ingested records; they are merged into lookups until the next rebuild.
+        A record with an already stored or buffered vaccination_id replaces that record. replaced
+        holds the rows being replaced, whose citizen_id locates the stored copies (defaults to frame).
+        """
+        frame = frame.drop_duplicates(ID_COLUMN, keep='last')
+        ids = frame[ID_COLUMN]
+        citizens = set(frame[KEY_COLUMN])
+        if replaced is not None:
+            citizens.update(replaced[KEY_COLUMN])
+        stored = [self._stored(citizen) for citizen in citizens]
+        stored = [rows[rows[ID_COLUMN].isin(ids)] for rows in stored if len(rows)]
+        with self._lock:
+            pending = self._pending
+            if pending is not None:
+                frame = pd.concat([pending[~pending[ID_COLUMN].isin(ids)], frame], ignore_index=True)
+            self._pending = frame.reset_index(drop=True)
+            if stored:
+                shadowed = pd.concat([rows[list(self._shadowed.columns)] for rows in stored], ignore_index=True)
+                shadowed = shadowed[~shadowed[ID_COLUMN].isin(self._shadowed[ID_COLUMN])]
+                if len(shadowed):
+                    self._shadowed = pd.concat([self._shadowed, shadowed], ignore_index=True)
+
+    def _stored(self, citizen_id):
+        """Stored records for one citizen, in key order (buffered changes not applied)."""
+        key = citizen_id.encode('utf-8')
+        frames = []
+        # The key can straddle a chunk boundary, so scan back from the last chunk starting <= key
+        chunk = bisect_right(self._key_mins, citizen_id) - 1
+        while chunk >= 0 and self.meta['chunks'][chunk]['key_max'] >= citizen_id:
+            keys = self._column(chunk, KEY_COLUMN)
+            lo, hi = np.searchsorted(keys, key, side='left'), np.searchsorted(keys, key, side='right')
+            if hi > lo:
+                frames.append(self._decode(chunk, slice(lo, hi)))
+            if lo > 0:
+                break
+            chunk -= 1
+        if not frames:
+            return pd.DataFrame(columns=list(self.meta['columns']))
+        return pd.concat(frames[::-1], ignore_index=True)
+
+    def doses(self, citizen_id):
+        """All vaccination records for one citizen, oldest first."""
+        records = self._stored(citizen_id)
+        pending, _ = self._buffer()
+        if pending is not None:
+            records = records[~records[ID_COLUMN].isin(pending[ID_COLUMN])]
+            buffered = pending[pending[KEY_COLUMN] == citizen_id]
+            if len(buffered):
+                records = pd.concat([records, buffered], ignore_index=True) if len(records) else buffered
+        return records.sort_values(['vaccination_date', 'dose_number']).reset_index(drop=True)
+
+    def hub_daily_counts(self, hub_id, start_date=None, end_date=None):
+        """Series of vaccinations per day (date string -> count) for one hub."""
+        first_day = pd.Timestamp(EPOCH) + pd.Timedelta(days=self.meta['first_day'])
+        code = self._codes.get('hub_id', {}).get(hub_id)
+        if code is not None:
+            counts = pd.Series(np.asarray(self._counts[code]),
+                               index=pd.date_range(first_day, periods=self._counts.shape[1], freq='D'))
+        else:
+            counts = pd.Series(dtype=np.int64, index=pd.DatetimeIndex([]))
+
+        pending, shadowed = self._buffer()
+        for frame, sign in ((shadowed, -1), (pending, 1)):
+            extra = frame[frame['hub_id'] == hub_id] if frame is not None else ()
+            if len(extra):
+                extra_counts = pd.to_datetime(extra['vaccination_date']).value_counts()
+                counts = counts.add(sign * extra_counts, fill_value=0)
+
+        counts = counts.sort_index()
+        if start_date:
+            counts = counts[counts.index >= pd.Timestamp(start_date)]
+        if end_date:
+            counts = counts[counts.index <= pd.Timestamp(end_date)]
+        counts = counts[counts > 0].astype(int)
+        counts.index = counts.index.strftime('%Y-%m-%d')
+        return counts
+
+if __name__ == '__main__':
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    csv_path = os.path.join(base_dir, '..', 'data', 'vaccination_records.csv')
+    store_dir = os.path.join(base_dir, '..', 'data', 'vaccination_store')
+    print(f"📦 Building vaccination record store from {csv_path} ...")
+    meta = build_store(csv_path, store_dir)
+    print(f"✅ Stored {meta['rows']} records in {len(meta['chunks'])} chunks at {store_dir}")
@@ -0,0 +1,246 @@
+"""
+Streaming Sketches for Vaccination Aggregates
+HyperLogLog (distinct citizens), count-min + top-k (high-cardinality frequencies) and exact
+counters (small categorical columns). Every structure is updated incrementally from record
+batches with vectorized numpy, and merges with another instance built on a different
+partition or worker.
+"""
+
+from collections import Counter
+import math
+
+from lazy import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+def hash_values(values):
+    """Stable 64-bit hashes (identical across processes) for a sequence of values."""
+    return pd.util.hash_pandas_object(pd.Series(values, dtype=object).astype(str), index=False).to_numpy(dtype=np.uint64)
+
+def _leading_zeros(words):
+    """Count leading zero bits of each uint64 (64 for zero)."""
+    words = words.copy()
+    zeros = np.zeros(words.shape, dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        empty = (words >> np.uint64(64 - shift)) == 0
+        zeros[empty] += shift
+        words[empty] <<= np.uint64(shift)
+    zeros[words == 0] += 1  # only reachable for an all-zero word: 63 + 1
+    return zeros
+
+# ============================================================================
+# HYPERLOGLOG (DISTINCT COUNTS PER KEY)
+# ============================================================================
+
+class KeyedHyperLogLog:
+    """One HyperLogLog per key (hub, division, ...) stored as a single register matrix.
+    Standard error is about 1.04 / sqrt(2**precision), i.e. 1.6% at the default precision of 12.
+    """
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.m = 1 << precision
+        self.keys = {}
+        self.registers = np.zeros((0, self.m), dtype=np.uint8)
+
+    def _rows(self, keys):
+        uniques, inverse = np.unique(np.asarray(keys, dtype=object).astype(str), return_inverse=True)
+        new = [key for key in uniques if key not in self.keys]
+        if new:
+            for key in new:
+                self.keys[key] = len(self.keys)
+            self.registers = np.vstack([self.registers, np.zeros((len(new), self.m), dtype=np.uint8)])
+        return np.array([self.keys[key] for key in uniques], dtype=np.int64)[inverse]
+
+    def add(self, keys, hashes):
+        """Add one hashed item per key (arrays of equal length)."""
+        if len(hashes) == 0:
+            return
+        rows = self._rows(keys)
+        buckets = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        remainder = hashes << np.uint64(self.precision)
+        ranks = np.minimum(_leading_zeros(remainder), 64 - self.precision) + 1
+        np.maximum.at(self.registers, (rows, buckets), ranks.astype(np.uint8))
+
+    def _estimate(self, registers):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m * self.m / np.sum(np.power(2.0, -registers.astype(np.float64)))
+        empty = int(np.count_nonzero(registers == 0))
+        if raw <= 2.5 * self.m and empty:
+            return self.m * math.log(self.m / empty)  # linear counting for small cardinalities
+        return raw
+
+    def estimate(self, key=None):
+        """Distinct count for one key, or across all keys (union) when key is None."""
+        if key is None:
+            if not self.keys:
+                return 0
+            return int(round(self._estimate(self.registers.max(axis=0))))
+        row = self.keys.get(key)
+        return 0 if row is None else int(round(self._estimate(self.registers[row])))
+
+    def estimates(self):
+        return {key: int(round(self._estimate(self.registers[row]))) for key, row in self.keys.items()}
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('Cannot merge HyperLogLogs with different precision')
+        for key, row in other.keys.items():
+            self._rows([key])
+            mine = self.keys[key]
+            self.registers[mine] = np.maximum(self.registers[mine], other.registers[row])
+        return self
+
+# ============================================================================
+# COUNT-MIN SKETCH WITH TOP-K
+# ============================================================================
+
+class CountMinTopK:
+    """Count-min sketch tracking the k most frequent values.
+    Estimates never undercount and overcount by at most e/width * total with probability 1 - e**-depth.
+    """
+
+    def __init__(self, width=2048, depth=4, k=20):
+        self.width = width
+        self.depth = depth
+        self.k = k
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+        self.heavy = {}
+
+    def _columns(self, hashes):
+        low = (hashes & np.uint64(0xFFFFFFFF)).astype(np.int64)
+        high = (hashes >> np.uint64(32)).astype(np.int64)
+        return [(low + i * high) % self.width for i in range(self.depth)]
+
+    def _query(self, hashes):
+        return np.min([self.table[i][cols] for i, cols in enumerate(self._columns(hashes))], axis=0)
+
+    def _refresh_heavy(self, candidates):
+        values = list(candidates)
+        if not values:
+            return
+        estimates = self._query(hash_values(values))
+        ranked = sorted(zip(values, estimates.tolist()), key=lambda item: item[1], reverse=True)
+        self.heavy = {value: count for value, count in ranked[:self.k] if count > 0}
+
+    def add(self, values):
+        """Count a batch of values (one pass of value_counts, then one sketch update per distinct value)."""
+        counts = pd.Series(values).astype(str).value_counts()
+        if counts.empty:
+            return
+        hashes = hash_values(counts.index)
+        for i, cols in enumerate(self._columns(hashes)):
+            np.add.at(self.table[i], cols, counts.to_numpy())
+        self.total += int(counts.sum())
+        self._refresh_heavy(set(self.heavy) | set(counts.index))
+
+    def remove(self, values):
+        """Take back values that were added before (the sketch is linear, so the bounds still hold)."""
+        counts = pd.Series(values).astype(str).value_counts()
+        if counts.empty:
+            return
+        hashes = hash_values(counts.index)
+        for i, cols in enumerate(self._columns(hashes)):
+            np.subtract.at(self.table[i], cols, counts.to_numpy())
+        self.total -= int(counts.sum())
+        self._refresh_heavy(self.heavy)
+
+    def estimate(self, value):
+        return int(self._query(hash_values([value]))[0])
+
+    def top(self, n=None):
+        return dict(list(self.heavy.items())[:n or self.k])
+
+    def error_bound(self):
+        return int(math.ceil(math.e / self.width * self.total))
+
+    def merge(self, other):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError('Cannot merge count-min sketches with different dimensions')
+        self.table += other.table
+        self.total += other.total
+        self._refresh_heavy(set(self.heavy) | set(other.heavy))
+        return self
+
+# ============================================================================
+# VACCINATION AGGREGATES
+# ============================================================================
+
+# Small-cardinality columns counted exactly
+EXACT_COLUMNS = ('age_group', 'gender', 'dose_number', 'comorbidity', 'vaccination_date')
+# Large or unbounded cardinality columns tracked with count-min/top-k, with their sketch width
+HEAVY_HITTER_COLUMNS = {'occupation': 1024, 'batch_id': 16384}
+
+class VaccinationSketch:
+    """Constant-size summary of the vaccination records behind /api/demographics and /api/coverage."""
+
+    def __init__(self, precision=12, depth=4, k=20):
+        self.rows = 0
+        self.exact = {column: Counter() for column in EXACT_COLUMNS}
+        self.heavy = {column: CountMinTopK(width, depth, k) for column, width in HEAVY_HITTER_COLUMNS.items()}
+        self.citizens_by_hub = KeyedHyperLogLog(precision)
+        self.citizens_by_division = KeyedHyperLogLog(precision)
+
+    def update(self, records, hub_divisions=None):
+        """Fold a batch of vaccination records (DataFrame) into the sketch."""
+        if len(records) == 0:
+            return self
+        self.rows += len(records)
+        for column in EXACT_COLUMNS:
+            if column in records:
+                self.exact[column].update(records[column].value_counts().to_dict())
+        for column in HEAVY_HITTER_COLUMNS:
+            if column in records:
+                self.heavy[column].add(records[column])
+
+        citizens = hash_values(records['citizen_id'])
+        self.citizens_by_hub.add(records['hub_id'].to_numpy(), citizens)
+        if hub_divisions:
+            divisions = records['hub_id'].map(hub_divisions)
+            known = divisions.notna().to_numpy()
+            self.citizens_by_division.add(divisions[known].to_numpy(), citizens[known])
+        return self
+
+    def remove(self, records):
+        """Take back records folded in before, e.g. the old versions of upserted rows.
+        Exact counters and count-min sketches are adjusted; HyperLogLogs can't forget a citizen,
+        so callers rebuild instead when a replacement changes a record's citizen or hub.
+        """
+        if len(records) == 0:
+            return self
+        self.rows -= len(records)
+        for column in EXACT_COLUMNS:
+            if column in records:
+                counter = self.exact[column]
+                counter.subtract(records[column].value_counts().to_dict())
+                for value in [value for value, count in counter.items() if count <= 0]:
+                    del counter[value]
+        for column in HEAVY_HITTER_COLUMNS:
+            if column in records:
+                self.heavy[column].remove(records[column])
+        return self
+
+    def merge(self, other):
+        """Combine with a sketch built on another partition or worker."""
+        self.rows += other.rows
+        for column in EXACT_COLUMNS:
+            self.exact[column].update(other.exact[column])
+        for column in HEAVY_HITTER_COLUMNS:
+            self.heavy[column].merge(other.heavy[column])
+        self.citizens_by_hub.merge(other.citizens_by_hub)
+        self.citizens_by_division.merge(other.citizens_by_division)
+        return self
+
+    def counts(self, column):
+        """Exact counts for a small-cardinality column, most frequent first."""
+        return dict(self.exact[column].most_common())
+
+    def distinct_citizens(self):
+        return {
+            'total': self.citizens_by_hub.estimate(),
+            'by_hub': dict(sorted(self.citizens_by_hub.estimates().items())),
+            'by_division': dict(sorted(self.citizens_by_division.estimates().items())),
+            'relative_error': round(1.04 / math.sqrt(self.citizens_by_hub.m), 4),
+        }
@@ -0,0 +1,369 @@
+"""
+Capacity-Aware Dose Slot Allocation
+Per-hub, per-day bookable capacity kept in (hubs x days) arrays. Each day's capacity_per_day is
+reduced by the walk-ins expected from history, and bookings are reserved and released under
+striped per-hub locks so concurrent requests can never oversubscribe a hub. With a shared
+bookings database the counts live there instead, so every worker process books against them.
+"""
+
+from contextlib import contextmanager
+from datetime import date, timedelta
+import itertools
+import sqlite3
+import threading
+
+from lazy import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+# How far ahead bookings are accepted, and how many hubs share one lock
+BOOKING_WINDOW_DAYS = 60
+LOCK_STRIPES = 64
+# Seconds a booking waits for another process's booking transaction before failing
+BOOKINGS_TIMEOUT = 30
+
+class SharedBookings:
+    """Reservations kept in a SQLite database that every worker process on the host opens.
+
+    Bookings run in IMMEDIATE transactions, which SQLite serializes across connections and
+    processes, so one worker's availability check and insert can't interleave with another's.
+    Each thread gets its own connection.
+    """
+
+    def __init__(self, path, timeout=BOOKINGS_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        with self.transaction() as db:
+            db.execute('''CREATE TABLE IF NOT EXISTS reservations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, hub_id TEXT NOT NULL, hub_name TEXT,
+                day TEXT NOT NULL, count INTEGER NOT NULL, citizen_id TEXT)''')
+            db.execute('CREATE INDEX IF NOT EXISTS reservations_day ON reservations (day, hub_id)')
+
+    def connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # Autocommit mode; transactions are opened explicitly below
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def transaction(self):
+        """Exclusive write transaction: committed on success, rolled back on error."""
+        db = self.connection()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def booked(self, db, start, days, hub_id=None):
+        """[(hub_id, day offset, slots booked)] for the window starting at `start`."""
+        query = 'SELECT hub_id, day, SUM(count) FROM reservations WHERE day >= ? AND day < ?'
+        params = [start.isoformat(), (start + timedelta(days=days)).isoformat()]
+        if hub_id is not None:
+            query += ' AND hub_id = ?'
+            params.append(hub_id)
+        return [(hub, (date.fromisoformat(day) - start).days, total)
+                for hub, day, total in db.execute(query + ' GROUP BY hub_id, day', params)]
+
+class SlotBook:
+    """Bookable dose slots for every hub over a rolling window that starts today.
+
+    available = capacity - expected walk-ins - booked, per hub and day. Expected walk-ins are
+    the hub's mean walk_in_count for that weekday, learned incrementally from daily_metrics.
+    Hub h is guarded by lock h % LOCK_STRIPES, so bookings at different hubs never contend.
+
+    Bookings are held in this process unless `shared` (a SharedBookings) is given; then they are
+    read from and written to the shared database, and `booked` is unused.
+    """
+
+    def __init__(self, window_days=BOOKING_WINDOW_DAYS, stripes=LOCK_STRIPES, shared=None):
+        self.window_days = window_days
+        self.shared = shared
+        self.start = date.today()
+        self.hubs = {}
+        self.hub_ids = []
+        self.hub_names = {}
+        self.capacity = np.zeros(0, dtype=np.int64)
+        self.booked = np.zeros((0, window_days), dtype=np.int64)
+        # Per-hub, per-weekday walk-in and appointment history (sums and day counts)
+        self.walk_in_sum = np.zeros((0, 7))
+        self.appointment_sum = np.zeros((0, 7))
+        self.observed_days = np.zeros((0, 7), dtype=np.int64)
+        self.last_day = np.zeros(0, dtype='datetime64[D]')
+        self.reservations = {}
+        self._ids = itertools.count(1)
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        # Held while arrays are grown or shifted; bookings only take their hub's stripe
+        self._structure = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Structure: hubs, capacity, history and the rolling window
+    # ------------------------------------------------------------------
+
+    def _all_stripes(self):
+        for lock in self._stripes:
+            lock.acquire()
+
+    def _release_stripes(self):
+        for lock in reversed(self._stripes):
+            lock.release()
+
+    def _rows(self, hub_ids):
+        """Row per hub id, growing every array for unseen hubs (caller holds the structure lock)."""
+        new = [hub for hub in pd.unique(np.asarray(hub_ids, dtype=object)) if hub not in self.hubs]
+        if new:
+            grow = len(new)
+            self._all_stripes()
+            try:
+                for hub in new:
+                    self.hubs[hub] = len(self.hubs)
+                    self.hub_ids.append(hub)
+                self.capacity = np.concatenate([self.capacity, np.zeros(grow, dtype=np.int64)])
+                self.booked = np.vstack([self.booked, np.zeros((grow, self.window_days), dtype=np.int64)])
+                self.walk_in_sum = np.vstack([self.walk_in_sum, np.zeros((grow, 7))])
+                self.appointment_sum = np.vstack([self.appointment_sum, np.zeros((grow, 7))])
+                self.observed_days = np.vstack([self.observed_days, np.zeros((grow, 7), dtype=np.int64)])
+                self.last_day = np.concatenate([self.last_day, np.full(grow, np.datetime64('NaT'), dtype='datetime64[D]')])
+            finally:
+                self._release_stripes()
+        return np.array([self.hubs[hub] for hub in hub_ids], dtype=np.int64)
+
+    def set_hubs(self, hubs):
+        """Load capacity_per_day from hubs_master; inactive hubs get no bookable capacity."""
+        with self._structure:
+            rows = self._rows(hubs['hub_id'].to_numpy())
+            capacity = hubs['capacity_per_day'].fillna(0).to_numpy(dtype=np.int64)
+            if 'operational_status' in hubs:
+                capacity = np.where(hubs['operational_status'].eq('Active').to_numpy(), capacity, 0)
+            self.capacity[rows] = capacity
+            self.hub_names.update(zip(hubs['hub_id'], hubs['hub_name']))
+        return self
+
+    def observe(self, metrics):
+        """Fold daily_metrics rows into the per-weekday walk-in history (each hub-day counted once).
+        Rows without a walk_in_count say nothing about demand and are skipped.
+        """
+        if 'walk_in_count' not in metrics:
+            return self
+        metrics = metrics[metrics['walk_in_count'].notna()]
+        if len(metrics) == 0:
+            return self
+        frame = metrics.assign(_day=pd.to_datetime(metrics['date']).to_numpy(dtype='datetime64[D]'))
+        frame = frame.sort_values('_day', kind='stable').drop_duplicates(['hub_id', '_day'], keep='last')
+        with self._structure:
+            rows = self._rows(frame['hub_id'].to_numpy())
+            last = self.last_day[rows]
+            days = frame['_day'].to_numpy(dtype='datetime64[D]')
+            fresh = np.isnat(last) | (days > last)
+            rows, days, frame = rows[fresh], days[fresh], frame[fresh]
+            if len(rows) == 0:
+                return self
+            weekdays = pd.DatetimeIndex(days).dayofweek.to_numpy()
+            np.add.at(self.walk_in_sum, (rows, weekdays), frame['walk_in_count'].fillna(0).to_numpy(dtype=np.float64))
+            np.add.at(self.appointment_sum, (rows, weekdays), frame.get('appointment_count', pd.Series(0, index=frame.index)).fillna(0).to_numpy(dtype=np.float64))
+            np.add.at(self.observed_days, (rows, weekdays), 1)
+            newest = pd.Series(days).groupby(rows).last()
+            self.last_day[newest.index.to_numpy()] = newest.to_numpy(dtype='datetime64[D]')
+        return self
+
+    def _roll(self):
+        """Advance the window to start today, dropping past days and their reservations."""
+        today = date.today()
+        if today <= self.start:
+            return
+        with self._structure:
+            shift = (today - self.start).days
+            if shift <= 0:
+                return
+            self._all_stripes()
+            try:
+                if self.shared is not None:
+                    with self.shared.transaction() as db:
+                        db.execute('DELETE FROM reservations WHERE day < ?', (today.isoformat(),))
+                kept = max(self.window_days - shift, 0)
+                self.booked[:, :kept] = self.booked[:, self.window_days - kept:]
+                self.booked[:, kept:] = 0
+                self.start = today
+                self.reservations = {rid: booking for rid, booking in self.reservations.items()
+                                     if booking['date'] >= today.isoformat()}
+            finally:
+                self._release_stripes()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _row(self, hub_id):
+        row = self.hubs.get(hub_id)
+        if row is None:
+            raise KeyError(hub_id)
+        return row
+
+    def _column(self, day):
+        offset = (day - self.start).days
+        if offset < 0:
+            raise ValueError('Date is in the past')
+        if offset >= self.window_days:
+            raise ValueError(f'Bookings open at most {self.window_days} days ahead')
+        return offset
+
+    def _weekdays(self):
+        return (self.start.weekday() + np.arange(self.window_days)) % 7
+
+    def expected_walk_ins(self, rows):
+        """(len(rows), window_days) expected walk-ins, rounded up so they are never undercounted."""
+        means = self.walk_in_sum[rows] / np.maximum(self.observed_days[rows], 1)
+        return np.ceil(means[:, self._weekdays()]).astype(np.int64)
+
+    def _booked(self, rows, db=None):
+        """(len(rows), window_days) slots booked; db is an open shared-bookings transaction, if any."""
+        if self.shared is None:
+            return self.booked[rows]
+        booked = np.zeros((len(rows), self.window_days), dtype=np.int64)
+        positions = {row: i for i, row in enumerate(rows.tolist())}
+        hub_id = self.hub_ids[rows[0]] if len(rows) == 1 else None
+        for hub, col, total in self.shared.booked(db or self.shared.connection(), self.start, self.window_days, hub_id):
+            position = positions.get(self.hubs.get(hub))
+            if position is not None and 0 <= col < self.window_days:
+                booked[position, col] = total
+        return booked
+
+    def available(self, rows, db=None):
+        """(len(rows), window_days) bookable slots left."""
+        bookable = self.capacity[rows][:, None] - self.expected_walk_ins(rows)
+        return np.maximum(bookable - self._booked(rows, db), 0)
+
+    def schedule(self, hub_id, start=None, days=14):
+        """Day-by-day capacity, expected demand and availability for one hub."""
+        self._roll()
+        row = self._row(hub_id)
+        first = self._column(start or self.start)
+        last = min(first + days, self.window_days)
+        rows = np.array([row])
+        walk_ins = self.expected_walk_ins(rows)[0]
+        booked = self._booked(rows)[0]
+        available = np.maximum(self.capacity[row] - walk_ins - booked, 0)
+        appointments = self.appointment_sum[row] / np.maximum(self.observed_days[row], 1)
+        weekdays = self._weekdays()
+        capacity = int(self.capacity[row])
+        return [
+            {
+                'date': (self.start + timedelta(days=int(col))).isoformat(),
+                'day_of_week': (self.start + timedelta(days=int(col))).strftime('%A'),
+                'capacity': capacity,
+                'expected_walk_ins': int(walk_ins[col]),
+                'typical_appointments': round(float(appointments[weekdays[col]]), 1),
+                'booked': int(booked[col]),
+                'available': int(available[col]),
+                'utilization': round(float((walk_ins[col] + booked[col]) / capacity * 100), 2) if capacity else 0.0,
+            }
+            for col in range(first, last)
+        ]
+
+    # ------------------------------------------------------------------
+    # Booking
+    # ------------------------------------------------------------------
+
+    def _pick(self, available, day, count):
+        """Column to book: `day`'s if it has room, else (day None) the earliest with room, or None."""
+        if day:
+            col = self._column(day)
+            return col if available[col] >= count else None
+        room = np.flatnonzero(available >= count)
+        return int(room[0]) if len(room) else None
+
+    def _reservation(self, number, hub_id, col, count, citizen_id):
+        return {
+            'reservation_id': f'R{number:08d}',
+            'hub_id': hub_id,
+            'hub_name': self.hub_names.get(hub_id),
+            'date': (self.start + timedelta(days=col)).isoformat(),
+            'count': count,
+            'citizen_id': citizen_id,
+        }
+
+    def reserve(self, hub_id, day=None, count=1, citizen_id=None):
+        """Reserve `count` slots at a hub on `day`, or on the earliest day with room if day is None.
+        Returns the reservation, or None when the hub has no room.
+        """
+        if count < 1:
+            raise ValueError('count must be at least 1')
+        self._roll()
+        row = self._row(hub_id)
+        if self.shared is not None:
+            # The transaction excludes every other booking, in this process or any other
+            with self.shared.transaction() as db:
+                col = self._pick(self.available(np.array([row]), db)[0], day, count)
+                if col is None:
+                    return None
+                reservation = self._reservation(0, hub_id, col, count, citizen_id)
+                number = db.execute(
+                    'INSERT INTO reservations (hub_id, hub_name, day, count, citizen_id) VALUES (?, ?, ?, ?, ?)',
+                    (hub_id, reservation['hub_name'], reservation['date'], count, citizen_id)).lastrowid
+            return dict(reservation, reservation_id=f'R{number:08d}')
+        with self._stripes[row % len(self._stripes)]:
+            # The window only moves while every stripe is held, so columns are stable in here
+            col = self._pick(self.available(np.array([row]))[0], day, count)
+            if col is None:
+                return None
+            self.booked[row, col] += count
+            reservation = self._reservation(next(self._ids), hub_id, col, count, citizen_id)
+            self.reservations[reservation['reservation_id']] = reservation
+        return reservation
+
+    def release(self, reservation_id):
+        """Cancel a reservation, returning its slots. Returns the reservation or None if unknown."""
+        self._roll()
+        if self.shared is not None:
+            try:
+                number = int(str(reservation_id)[1:]) if str(reservation_id).startswith('R') else None
+            except ValueError:
+                number = None
+            if number is None:
+                return None
+            with self.shared.transaction() as db:
+                found = db.execute('SELECT hub_id, hub_name, day, count, citizen_id FROM reservations WHERE id = ?',
+                                   (number,)).fetchone()
+                if found is None:
+                    return None
+                db.execute('DELETE FROM reservations WHERE id = ?', (number,))
+            hub_id, hub_name, day, count, citizen_id = found
+            return {'reservation_id': f'R{number:08d}', 'hub_id': hub_id, 'hub_name': hub_name,
+                    'date': day, 'count': count, 'citizen_id': citizen_id}
+        reservation = self.reservations.get(reservation_id)
+        if reservation is None:
+            return None
+        row = self.hubs[reservation['hub_id']]
+        with self._stripes[row % len(self._stripes)]:
+            # Another request may have released it while we waited for the lock
+            if self.reservations.pop(reservation_id, None) is None:
+                return None
+            col = (date.fromisoformat(reservation['date']) - self.start).days
+            if 0 <= col < self.window_days:
+                self.booked[row, col] = max(self.booked[row, col] - reservation['count'], 0)
+        return reservation
+
+    def stats(self):
+        rows = np.arange(len(self.hubs))
+        booked = self._booked(rows) if len(rows) else np.zeros((0, self.window_days), dtype=np.int64)
+        if self.shared is not None:
+            reservations = self.shared.connection().execute(
+                'SELECT COUNT(*) FROM reservations WHERE day >= ?', (self.start.isoformat(),)).fetchone()[0]
+        else:
+            reservations = len(self.reservations)
+        return {
+            'hubs': len(self.hubs),
+            'window_start': self.start.isoformat(),
+            'window_days': self.window_days,
+            'shared': self.shared is not None,
+            'reservations': reservations,
+            'booked_slots': int(booked.sum()),
+            'available_slots': int(self.available(rows).sum()) if len(rows) else 0,
+        }
@@ -0,0 +1,200 @@
+"""
+Shared Dataset Snapshots
+Publishes the loaded tables as memory-mapped column files with a version header, so every
+worker process on a host maps the same pages instead of holding its own pandas copy. Workers
+attach zero-copy, read-only views and follow the header when another worker publishes.
+
+Layout under the snapshot root:
+    CURRENT.json              header of the live snapshot (version, token, tables, columns)
+    v00000007/<table>/*.npy   one file per column; strings are stored as codes + dictionary
+
+String columns attach as categoricals over the shared codes, except ISO date columns, which
+are decoded back to strings per worker because handlers filter them with < and >.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import json
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishing is not serialized across processes
+    fcntl = None
+
+from lazy import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+FORMAT_VERSION = 1
+HEADER_FILE = 'CURRENT.json'
+LOCK_FILE = '.publish.lock'
+# Snapshots kept on disk; older ones are removed once unpublished (open mappings stay valid on POSIX)
+KEEP_SNAPSHOTS = 2
+
+# ============================================================================
+# COLUMN ENCODING
+# ============================================================================
+
+def _is_ordered(name):
+    """ISO date strings are filtered with < and >, which unordered categoricals don't support."""
+    return 'date' in name or name == 'last_updated'
+
+def _write_column(table_dir, index, series):
+    """Write one column as .npy file(s) and return its header entry."""
+    name = f'{index:03d}'
+    if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+        np.save(os.path.join(table_dir, f'{name}.npy'), series.to_numpy())
+        return {'name': series.name, 'file': name, 'kind': 'plain', 'dtype': str(series.dtype)}
+    # Strings: sorted distinct values plus codes (-1 = missing), so no pickled objects are shared
+    uniques = np.sort(np.asarray(series.dropna().unique(), dtype=str))
+    codes = pd.Categorical(series, categories=uniques).codes
+    np.save(os.path.join(table_dir, f'{name}.npy'), codes)
+    np.save(os.path.join(table_dir, f'{name}.dict.npy'), uniques)
+    kind = 'dictionary' if _is_ordered(series.name) else 'category'
+    return {'name': series.name, 'file': name, 'kind': kind, 'dtype': str(series.dtype)}
+
+def _read_column(table_dir, column):
+    values = np.load(os.path.join(table_dir, f"{column['file']}.npy"), mmap_mode='r')
+    if column['kind'] == 'plain':
+        return values
+    uniques = pd.Index(np.load(os.path.join(table_dir, f"{column['file']}.dict.npy")).astype(object), dtype=column['dtype'])
+    if column['kind'] == 'category':
+        # The codes stay memory-mapped; only the distinct values live in each worker.
+        # (from_codes' validate= keyword needs pandas 2.1, newer than requirements.txt pins)
+        return pd.Categorical.from_codes(values, dtype=pd.CategoricalDtype(uniques))
+    # Missing values (code -1) pick the trailing NaN; each distinct string is one object per worker
+    lookup = np.append(uniques.to_numpy(dtype=object), np.nan)
+    return pd.array(lookup[values], dtype=column['dtype'])
+
+# ============================================================================
+# PUBLISH & ATTACH
+# ============================================================================
+
+class SnapshotStore:
+    """Publisher and reader for versioned table snapshots under one directory."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._header = None
+        self._header_stat = None
+
+    @contextmanager
+    def lock(self):
+        """Serialize publishing (and read-modify-publish sequences) across worker processes."""
+        with open(os.path.join(self.root, LOCK_FILE), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def header(self):
+        """The live snapshot header, or None. Re-read only when CURRENT.json changes (one stat per call)."""
+        path = os.path.join(self.root, HEADER_FILE)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key != self._header_stat:
+            try:
+                with open(path) as f:
+                    header = json.load(f)
+            except (OSError, ValueError):
+                return self._header
+            if header.get('format_version') != FORMAT_VERSION:
+                return None
+            self._header, self._header_stat = header, key
+        return self._header
+
+    def publish(self, tables, version, token, base=None, meta=None):
+        """Write `tables` as snapshot `version` and make it live. Tables not given are carried
+        over from the `base` header by hard link, so publishing one changed table copies nothing else.
+        `meta` is stored in the header as is (default: the base header's). Call under lock() when
+        several processes may publish.
+        """
+        snapshot_name = f'v{version:08d}'
+        work_dir = os.path.join(self.root, f'{snapshot_name}.{os.getpid()}.tmp')
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir)
+        entries = {}
+        for name, frame in tables.items():
+            table_dir = os.path.join(work_dir, name)
+            os.makedirs(table_dir)
+            columns = [_write_column(table_dir, i, frame[column]) for i, column in enumerate(frame.columns)]
+            entries[name] = {'rows': len(frame), 'columns': columns}
+        if base is not None:
+            for name, entry in base['tables'].items():
+                if name in entries:
+                    continue
+                source = os.path.join(self.root, base['snapshot'], name)
+                target = os.path.join(work_dir, name)
+                os.makedirs(target)
+                for filename in os.listdir(source):
+                    try:
+                        os.link(os.path.join(source, filename), os.path.join(target, filename))
+                    except OSError:
+                        shutil.copy2(os.path.join(source, filename), os.path.join(target, filename))
+                entries[name] = entry
+
+        header = {
+            'format_version': FORMAT_VERSION,
+            'version': version,
+            'token': token,
+            'snapshot': snapshot_name,
+            'published_at': datetime.now(timezone.utc).isoformat(),
+            'publisher_pid': os.getpid(),
+            'tables': entries,
+            'meta': meta if meta is not None else (base or {}).get('meta', {}),
+        }
+        snapshot_dir = os.path.join(self.root, snapshot_name)
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        os.rename(work_dir, snapshot_dir)
+        tmp_path = os.path.join(self.root, f'{HEADER_FILE}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(header, f)
+        os.replace(tmp_path, os.path.join(self.root, HEADER_FILE))
+        self._prune(snapshot_name)
+        return header
+
+    def _prune(self, live):
+        snapshots = sorted(name for name in os.listdir(self.root)
+                           if name.startswith('v') and '.' not in name and name != live)
+        for name in snapshots[:max(len(snapshots) - (KEEP_SNAPSHOTS - 1), 0)]:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def attach(self, header, names=None):
+        """Read-only DataFrames over the snapshot's column files. Numeric columns are memory-mapped
+        without copying; string columns are rebuilt from their dictionary codes.
+        """
+        frames = {}
+        for name, entry in header['tables'].items():
+            if names is not None and name not in names:
+                continue
+            table_dir = os.path.join(self.root, header['snapshot'], name)
+            columns = {column['name']: _read_column(table_dir, column) for column in entry['columns']}
+            frames[name] = pd.DataFrame(columns, copy=False)
+        return frames
+
+    def stats(self):
+        header = self.header()
+        if header is None:
+            return {'root': self.root, 'version': None}
+        snapshot_dir = os.path.join(self.root, header['snapshot'])
+        size = sum(os.path.getsize(os.path.join(folder, filename))
+                   for folder, _, filenames in os.walk(snapshot_dir) for filename in filenames)
+        return {
+            'root': self.root,
+            'version': header['version'],
+            'token': header['token'],
+            'published_at': header['published_at'],
+            'publisher_pid': header['publisher_pid'],
+            'bytes': size,
+            'tables': {name: entry['rows'] for name, entry in header['tables'].items()},
+        }
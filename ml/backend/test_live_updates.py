@@ -0,0 +1,58 @@
+"""
+Live Update Tests
+An ingest into a freshly started worker (datasets loaded lazily) must push insight deltas to
+subscribers of /api/stream, and an upsert must keep the vaccination sketch in step with the table.
+
+    cd ml/backend && python -m pytest test_live_updates.py
+"""
+
+import queue
+
+import pandas as pd
+import pytest
+
+import app as backend
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(backend, 'ADMIN_TOKEN', None)
+    return backend.app.test_client()
+
+def _drain(subscription):
+    events = []
+    while True:
+        try:
+            events.append(subscription.queue.get_nowait())
+        except queue.Empty:
+            return events
+
+def test_ingest_publishes_insight_delta(client):
+    subscription = backend.broker.subscribe(event_types=['insight'])
+    try:
+        record = {
+            'wastage_id': 'TEST_WASTAGE_1', 'hub_id': 'HUB_001', 'hub_name': 'Test Hub', 'vaccine_name': 'Pfizer',
+            'quantity_wasted': 10_000_000, 'wastage_date': '2024-09-01', 'wastage_reason': 'Expired',
+        }
+        response = client.post('/api/ingest/wastage', json={'records': [record]})
+        assert response.status_code == 200, response.get_json()
+
+        events = _drain(subscription)
+        assert [event['data']['title'] for event in events] == ['High Wastage Alert']
+        assert 'Test Hub' in events[0]['data']['message']
+        assert events[0]['version'] == response.get_json()['data']['version']
+    finally:
+        backend.broker.unsubscribe(subscription)
+
+def test_upserted_vaccination_replaces_its_sketch_counts(client):
+    backend.get_vaccination_sketch()
+    vaccinations = backend.data.get('vaccinations')
+    record = vaccinations.iloc[[0]].astype(object).to_dict(orient='records')[0]
+    record = {field: (None if pd.isna(value) else value) for field, value in record.items()}
+    record['gender'] = 'Female' if record['gender'] == 'Male' else 'Male'
+    response = client.post('/api/ingest/vaccinations', json={'records': [record]})
+    assert response.status_code == 200, response.get_json()
+
+    sketch = backend.get_vaccination_sketch()
+    vaccinations = backend.data.get('vaccinations')
+    assert sketch.rows == len(vaccinations)
+    assert sketch.counts('gender') == vaccinations['gender'].value_counts().to_dict()
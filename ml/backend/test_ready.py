@@ -0,0 +1,34 @@
+"""
+Readiness Tests
+/api/ready must take the worker out of rotation while a dataset failed to load, but not for a
+missing model, which only the prediction endpoints need.
+
+    cd ml/backend && python -m pytest test_ready.py
+"""
+
+import pytest
+
+import app as backend
+
+@pytest.fixture
+def loaded(monkeypatch):
+    """Every resource ready; tests mark the ones that failed."""
+    for name in backend.resources:
+        monkeypatch.setitem(backend.resources, name, {'state': 'ready'})
+    monkeypatch.setattr(backend, '_prewarm_thread', None)
+    return backend.app.test_client()
+
+def test_failed_dataset_makes_the_worker_unready(loaded, monkeypatch):
+    monkeypatch.setitem(backend.resources, 'demographics', {'state': 'missing', 'error': 'not found'})
+    monkeypatch.setitem(backend.resources, 'wastage', {'state': 'error', 'error': 'bad CSV'})
+    response = loaded.get('/api/ready')
+    assert response.status_code == 503
+    assert response.get_json()['status'] == 'degraded'
+    assert response.get_json()['data']['failed'] == ['demographics', 'wastage']
+
+def test_missing_model_is_still_ready(loaded, monkeypatch):
+    monkeypatch.setitem(backend.resources, 'model', {'state': 'missing', 'error': 'model file not found'})
+    response = loaded.get('/api/ready')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ready'
+    assert response.get_json()['data']['failed'] == []
@@ -0,0 +1,63 @@
+"""
+Record Store Tests
+A store built in several chunks must return exactly what the CSV holds, whatever types pandas
+would infer for each chunk on its own, and ingested records must replace stored ones.
+
+    cd ml/backend && python -m pytest test_record_store.py
+"""
+
+import pandas as pd
+import pytest
+
+from record_store import RecordStore
+
+# Chunks of 3 rows: the first has an all-bool comorbidity and a gap-free dose_number; later
+# chunks have missing values in both, so read alone they would be parsed as other types
+CSV = """vaccination_id,citizen_id,hub_id,vaccine_name,dose_number,vaccination_date,comorbidity
+V01,C1,HUB_A,Pfizer,1,2024-01-01,True
+V02,C2,HUB_A,Moderna,1,2024-01-01,False
+V03,C3,HUB_B,Pfizer,1,2024-01-02,True
+V04,C1,HUB_A,,2,2024-02-01,
+V05,C2,HUB_B,Sinopharm,,2024-02-01,False
+V06,C4,HUB_A,Pfizer,1,2024-01-01,True
+V07,C3,HUB_B,Moderna,2,2024-02-02,
+V08,C4,HUB_A,Pfizer,2,2024-02-01,False
+"""
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / 'vaccination_records.csv'
+    path.write_text(CSV)
+    return RecordStore.open_or_build(str(path), str(tmp_path / 'store'), chunk_rows=3)
+
+def _records(frame):
+    frame = frame.sort_values('vaccination_id').astype(object)
+    return frame.where(frame.notna(), None).to_dict(orient='records')
+
+def test_chunks_with_different_inferred_types_decode_like_the_csv(store, tmp_path):
+    expected = pd.read_csv(tmp_path / 'vaccination_records.csv')
+    for citizen in ('C1', 'C2', 'C3', 'C4'):
+        doses = store.doses(citizen)
+        rows = expected[expected['citizen_id'] == citizen]
+        assert _records(doses) == _records(rows[list(doses.columns)])
+    # Booleans stay booleans, not the strings 'True'/'False'
+    assert store.doses('C1')['comorbidity'].tolist() == [True, None]
+    assert store.doses('C4')['comorbidity'].tolist() == [True, False]
+    assert store.doses('C2')['dose_number'].isna().tolist() == [False, True]
+    assert store.hub_daily_counts('HUB_A').to_dict() == {'2024-01-01': 3, '2024-02-01': 2}
+
+def test_value_of_another_type_later_in_the_file_is_an_error(tmp_path):
+    path = tmp_path / 'vaccination_records.csv'
+    path.write_text(CSV.replace('V07,C3,HUB_B,Moderna,2,', 'V07,C3,HUB_B,Moderna,second,'))
+    with pytest.raises(ValueError):
+        RecordStore.open_or_build(str(path), str(tmp_path / 'store'), chunk_rows=3)
+
+def test_ingested_records_replace_stored_ones(store):
+    stored = store.doses('C1')
+    moved = stored[stored['vaccination_id'] == 'V01'].assign(hub_id='HUB_B')
+    store.append(moved, stored[stored['vaccination_id'] == 'V01'])
+    store.append(moved)
+    assert store.doses('C1')['vaccination_id'].tolist() == ['V01', 'V04']
+    assert store.hub_daily_counts('HUB_A').to_dict() == {'2024-01-01': 2, '2024-02-01': 2}
+    assert store.hub_daily_counts('HUB_B').to_dict() == {'2024-01-01': 1, '2024-01-02': 1, '2024-02-01': 1, '2024-02-02': 1}
+    assert len(store) == 8
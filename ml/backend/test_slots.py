@@ -0,0 +1,107 @@
+"""
+Slot Book Tests
+Concurrent reservations must never oversubscribe a hub, with bookings held in memory or in a
+shared bookings database, and the booking window must roll forward with the calendar.
+
+    cd ml/backend && python -m pytest test_slots.py
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import multiprocessing
+
+import pandas as pd
+import pytest
+
+import slots
+from slots import SharedBookings, SlotBook
+
+CAPACITY = 20
+HUBS = pd.DataFrame({
+    'hub_id': ['HUB_A', 'HUB_B'],
+    'hub_name': ['Hub A', 'Hub B'],
+    'capacity_per_day': [CAPACITY, CAPACITY],
+    'operational_status': ['Active', 'Active'],
+})
+
+def _book(path=None, window_days=7):
+    return SlotBook(window_days=window_days, shared=SharedBookings(path) if path else None).set_hubs(HUBS)
+
+def _reserve_all(book, attempts, day):
+    """Try `attempts` single-slot bookings at HUB_A on `day`; returns the reservations made."""
+    made = [book.reserve('HUB_A', day) for _ in range(attempts)]
+    return [reservation for reservation in made if reservation is not None]
+
+def _reserve_in_process(path, attempts, day, results):
+    results.put(len(_reserve_all(_book(path), attempts, day)))
+
+@pytest.fixture
+def fixed_today(monkeypatch):
+    """Pin the slot book's calendar; set `.current` to move it."""
+    class FixedDate(date):
+        current = date(2030, 1, 7)
+
+        @classmethod
+        def today(cls):
+            return cls.current
+
+    monkeypatch.setattr(slots, 'date', FixedDate)
+    return FixedDate
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_concurrent_reservations_never_oversubscribe(tmp_path, shared):
+    book = _book(str(tmp_path / 'bookings.sqlite3') if shared else None)
+    day = date.today() + timedelta(days=1)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        made = sum(pool.map(lambda _: len(_reserve_all(book, 5, day)), range(8)))
+    assert made == CAPACITY
+    assert book.schedule('HUB_A', day, 1)[0]['available'] == 0
+    assert book.schedule('HUB_B', day, 1)[0]['available'] == CAPACITY
+    assert book.stats()['booked_slots'] == CAPACITY
+
+def test_shared_reservations_never_oversubscribe_across_processes(tmp_path):
+    path = str(tmp_path / 'bookings.sqlite3')
+    SharedBookings(path)
+    day = date.today() + timedelta(days=1)
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    workers = [context.Process(target=_reserve_in_process, args=(path, 10, day, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    made = sum(results.get(timeout=60) for _ in workers)
+    for worker in workers:
+        worker.join(timeout=60)
+    assert made == CAPACITY
+    # A process that joins later sees the same counts
+    assert _book(path).schedule('HUB_A', day, 1)[0]['booked'] == CAPACITY
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_release_returns_slots_once(tmp_path, shared):
+    book = _book(str(tmp_path / 'bookings.sqlite3') if shared else None)
+    reservation = book.reserve('HUB_A', count=CAPACITY)
+    assert book.reserve('HUB_A', date.fromisoformat(reservation['date'])) is None
+    assert book.release(reservation['reservation_id'])['count'] == CAPACITY
+    assert book.release(reservation['reservation_id']) is None
+    assert book.stats()['booked_slots'] == 0
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_window_rolls_forward(tmp_path, fixed_today, shared):
+    book = _book(str(tmp_path / 'bookings.sqlite3') if shared else None)
+    today = fixed_today.current
+    soon = book.reserve('HUB_A', today + timedelta(days=1), count=5)
+    later = book.reserve('HUB_A', today + timedelta(days=3), count=7)
+    with pytest.raises(ValueError):
+        book.reserve('HUB_A', today + timedelta(days=7))
+
+    fixed_today.current = today + timedelta(days=2)
+    schedule = book.schedule('HUB_A', days=7)
+    assert schedule[0]['date'] == fixed_today.current.isoformat()
+    # The earlier booking fell out of the window; the later one moved with its date
+    assert {day['date']: day['booked'] for day in schedule if day['booked']} == {later['date']: 7}
+    assert book.stats()['reservations'] == 1
+    assert book.release(soon['reservation_id']) is None
+    assert book.release(later['reservation_id'])['date'] == later['date']
+    # New days open at the end of the window, and past days can't be booked
+    assert book.reserve('HUB_A', today + timedelta(days=8)) is not None
+    with pytest.raises(ValueError):
+        book.reserve('HUB_A', today + timedelta(days=1))
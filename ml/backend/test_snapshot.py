@@ -0,0 +1,100 @@
+"""
+Shared Snapshot Tests
+Tables published to a snapshot must attach with the same values, the API must serve from a
+snapshot end to end, and a worker following another's snapshot must update its derived state
+in place. Run these under the versions pinned in ml/requirements.txt too:
+
+    python -m venv venv && venv/bin/pip install -r ../requirements.txt pytest
+    cd ml/backend && ../venv/bin/python -m pytest test_snapshot.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+from snapshot import SnapshotStore
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def test_published_tables_attach_unchanged(tmp_path):
+    frame = pd.DataFrame({
+        'hub_id': ['HUB_001', 'HUB_002', None, 'HUB_001'],
+        'status': ['In_Transit', 'Delivered', 'Delivered', None],
+        'transfer_date': ['2024-01-03', None, '2024-01-01', '2024-01-02'],
+        'quantity': [5, 7, 0, 12],
+        'distance_km': [1.5, np.nan, 3.25, 0.0],
+        'cold_chain': [True, False, True, True],
+    })
+    store = SnapshotStore(str(tmp_path))
+    header = store.publish({'movements': frame}, 1, 'token')
+    attached = store.attach(store.header())['movements']
+
+    assert header['version'] == 1 and store.header()['token'] == 'token'
+    assert list(attached.columns) == list(frame.columns)
+    assert isinstance(attached['hub_id'].dtype, pd.CategoricalDtype)
+    for column in frame.columns:
+        expected = frame[column].astype(object).where(frame[column].notna(), None).tolist()
+        actual = attached[column].astype(object).where(attached[column].notna(), None).tolist()
+        assert actual == expected, column
+    # Date strings stay comparable, since handlers filter them with < and >
+    assert attached[attached['transfer_date'] >= '2024-01-02']['quantity'].tolist() == [5, 12]
+
+def _run_app(script, snapshot_dir):
+    # A fresh interpreter, because SNAPSHOT_DIR is read when app is imported
+    env = dict(os.environ, SNAPSHOT_DIR=str(snapshot_dir), PYTHONPATH=BACKEND_DIR, PREWARM='0')
+    result = subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_api_serves_from_a_snapshot(tmp_path):
+    script = '''
+import json
+import app
+client = app.app.test_client()
+paths = ['/api/hubs', '/api/overview', '/api/movements?status=In_Transit', '/api/insights',
+         '/api/coverage', '/api/demographics', '/api/wastage/stats', '/api/quality']
+print(json.dumps({path: client.get(path).status_code for path in paths}))
+'''
+    statuses = _run_app(script, tmp_path / 'snapshots')
+    assert set(statuses.values()) == {200}, statuses
+    assert os.path.exists(tmp_path / 'snapshots' / 'CURRENT.json')
+
+def test_following_a_snapshot_updates_derived_state_in_place(tmp_path):
+    script = '''
+import json
+import app
+client = app.app.test_client()
+client.get('/api/overview')
+client.get('/api/hubs')
+built = [app.get_vaccination_sketch(), app.get_hub_summary(), app.get_anomaly_detector(), app.get_forecaster()]
+
+def publish(tables):
+    # As another worker would: the next version, on top of the current one
+    header = app.snapshots.header()
+    app.snapshots.publish(tables, header['version'] + 1, f"other-{header['version']}", base=header, meta=header.get('meta'))
+    assert app.sync_snapshot()
+
+# One vaccination corrected and one inventory row restocked elsewhere
+vaccinations = app.data['vaccinations'].astype({'gender': object})
+vaccinations.loc[0, 'gender'] = 'Female' if vaccinations.loc[0, 'gender'] == 'Male' else 'Male'
+inventory = app.data['inventory'].copy()
+inventory.loc[0, 'quantity_remaining'] += 100
+publish({'vaccinations': vaccinations, 'inventory': inventory})
+kept = [state is app_state for state, app_state in zip(built, [app._vaccination_sketch, app._hub_summary, app._anomaly_detector, app._forecaster])]
+sketch_gender = app._vaccination_sketch.counts('gender') == app.data['vaccinations']['gender'].value_counts().to_dict()
+maintained = app.get_hub_summary().projection().to_json()
+app._reset_hub_summary()
+summary_matches = app.get_hub_summary().projection().to_json() == maintained
+
+# A daily_metrics row deleted (by a reload elsewhere) can't be taken out of the history
+publish({'daily_metrics': app.data['daily_metrics'].iloc[1:]})
+rebuilt = [app._anomaly_detector is None, app._forecaster is None]
+print(json.dumps({'kept': kept, 'sketch_gender': sketch_gender, 'summary_matches': summary_matches, 'rebuilt': rebuilt}))
+'''
+    result = _run_app(script, tmp_path / 'snapshots')
+    assert result == {'kept': [True] * 4, 'sketch_gender': True, 'summary_matches': True, 'rebuilt': [True, True]}
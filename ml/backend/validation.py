@@ -0,0 +1,268 @@
+"""
+Data-Quality Validation
+Vectorized constraint checks run on every table load and ingest batch. Each rule is one
+boolean mask over the batch; rows that break an error rule are moved to a quarantine side
+table (with the rules they broke) instead of reaching the aggregates, while warning rules are
+only counted. Hub references are resolved against hubs_master through a hash index.
+"""
+
+from datetime import datetime, timezone
+import threading
+import time
+
+from lazy import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+# Per-table rules:
+#   required    columns that must be present and non-empty
+#   numbers     column -> (min, max); None leaves that side open. Non-numeric values fail too
+#   dates       columns that must parse as ISO dates when present
+#   order       (earlier, later) date pairs; later may not precede earlier
+#   references  columns holding a hub_id that must exist in hubs_master
+#   warn        the same rule kinds, reported but never quarantined
+SCHEMAS = {
+    'hubs': {
+        'required': ('hub_name',),
+        'numbers': {
+            'capacity_per_day': (0, None), 'storage_capacity': (0, None), 'population_coverage': (0, None),
+            'staff_count': (0, None), 'latitude': (-90, 90), 'longitude': (-180, 180),
+        },
+    },
+    'inventory': {
+        'required': ('hub_id',),
+        'numbers': {
+            'quantity_received': (0, None), 'quantity_remaining': (0, None),
+            'quantity_wasted': (0, None), 'quantity_administered': (0, None),
+        },
+        'dates': ('received_date', 'expiry_date', 'last_updated'),
+        'order': (('received_date', 'expiry_date'),),
+        'references': ('hub_id',),
+    },
+    'movements': {
+        'required': ('from_hub_id', 'to_hub_id', 'transfer_date'),
+        'numbers': {'quantity_transferred': (0, None), 'distance_km': (0, None)},
+        'dates': ('transfer_date', 'expected_delivery_date', 'actual_delivery_date'),
+        'order': (('transfer_date', 'expected_delivery_date'), ('transfer_date', 'actual_delivery_date')),
+        'references': ('from_hub_id', 'to_hub_id'),
+    },
+    'vaccinations': {
+        'required': ('citizen_id', 'hub_id', 'vaccination_date'),
+        'numbers': {'dose_number': (1, None)},
+        'dates': ('vaccination_date',),
+        'references': ('hub_id',),
+    },
+    'wastage': {
+        'required': ('hub_id', 'wastage_date'),
+        'numbers': {'quantity_wasted': (0, None), 'cost_impact': (0, None)},
+        'dates': ('wastage_date',),
+        'references': ('hub_id',),
+    },
+    'daily_metrics': {
+        'required': ('hub_id', 'date'),
+        'numbers': {
+            'opening_stock': (0, None), 'received_quantity': (0, None), 'administered_quantity': (0, None),
+            'wasted_quantity': (0, None), 'closing_stock': (0, None), 'appointment_count': (0, None),
+            'walk_in_count': (0, None), 'wastage_rate': (0, 100), 'utilization_rate': (0, 100),
+            'humidity_avg': (0, 100), 'power_outage_hours': (0, 24),
+        },
+        'dates': ('date',),
+        'references': ('hub_id',),
+        # Footfall is derived noisily by the generator and unused by any aggregate
+        'warn': {'numbers': {'footfall': (0, None)}},
+    },
+    'demographics': {
+        'required': ('division', 'date'),
+        'numbers': {
+            'total_population': (0, None), 'eligible_population': (0, None), 'vaccinated_count': (0, None),
+            'coverage_percentage': (0, 100), 'age_18_30_pct': (0, 100), 'age_30_45_pct': (0, 100),
+            'age_45_60_pct': (0, 100), 'age_60_plus_pct': (0, 100),
+            'male_pct': (0, 100), 'female_pct': (0, 100), 'other_pct': (0, 100),
+        },
+        'dates': ('date',),
+    },
+}
+
+# Quarantined rows kept per table; the oldest are dropped first
+QUARANTINE_LIMIT = 10_000
+
+# ============================================================================
+# CHECKS
+# ============================================================================
+
+def _numbers(series):
+    """Float values of a column and a mask of entries that are present but not numeric."""
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        return series.to_numpy(dtype=np.float64, na_value=np.nan), np.zeros(len(series), dtype=bool)
+    values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    return values, series.notna().to_numpy() & np.isnan(values)
+
+def _blank(series):
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series.isna().to_numpy()
+    # Comparing the object array directly is several times faster than the .str accessor
+    values = np.asarray(series, dtype=object)
+    return pd.isna(values) | (values == '')
+
+def _check(rules, frame, hub_index, coerced):
+    """Yield (issue, mask) for each rule in `rules`; masks are True for offending rows.
+    Numeric columns that needed parsing are added to `coerced` so clean rows can be converted.
+    """
+    for column in rules.get('required', ()):
+        if column not in frame:
+            yield f'{column}:missing', np.ones(len(frame), dtype=bool)
+        else:
+            yield f'{column}:missing', _blank(frame[column])
+
+    for column, (low, high) in rules.get('numbers', {}).items():
+        if column not in frame:
+            continue
+        values, invalid = _numbers(frame[column])
+        if not pd.api.types.is_numeric_dtype(frame[column].dtype):
+            coerced.add(column)
+        yield f'{column}:not_a_number', invalid
+        with np.errstate(invalid='ignore'):
+            if low is not None:
+                yield f'{column}:below_{low}', values < low
+            if high is not None:
+                yield f'{column}:above_{high}', values > high
+
+    dates = {}
+    for column in rules.get('dates', ()):
+        if column not in frame:
+            continue
+        # ISO8601 accepts both dates and timestamps; to_datetime parses each distinct string once
+        parsed = pd.to_datetime(frame[column], format='ISO8601', errors='coerce')
+        dates[column] = parsed
+        yield f'{column}:invalid_date', (frame[column].notna() & parsed.isna()).to_numpy()
+
+    for earlier, later in rules.get('order', ()):
+        if earlier in dates and later in dates:
+            yield f'{later}:before_{earlier}', (dates[later] < dates[earlier]).to_numpy()
+
+    if hub_index is not None:
+        for column in rules.get('references', ()):
+            if column not in frame:
+                continue
+            # Hash lookup of every row's hub id; -1 means no such hub (blank ids are 'missing' instead)
+            positions = hub_index.get_indexer(np.asarray(frame[column], dtype=object))
+            yield f'{column}:unknown_hub', (positions < 0) & frame[column].notna().to_numpy()
+
+def validate(table, frame, key=None, hubs=None):
+    """Check one batch of `table` rows.
+
+    Returns (clean, rejected, summary). clean holds the rows that passed every error rule, with
+    numeric columns parsed to numbers; rejected holds the others plus a `quality_issues` column
+    listing the broken rules ('column:problem', ';'-separated). Duplicate keys keep the last row.
+    Reference checks are skipped when `hubs` is None.
+    """
+    started = time.perf_counter()
+    schema = SCHEMAS.get(table, {})
+    rules = dict(schema, required=((key,) if key else ()) + tuple(schema.get('required', ())))
+    hub_index = None
+    if hubs is not None and 'hub_id' in hubs:
+        hub_index = pd.Index(pd.unique(np.asarray(hubs['hub_id'].dropna(), dtype=object)))
+
+    coerced = set()
+    errors = [(issue, mask) for issue, mask in _check(rules, frame, hub_index, coerced) if mask.any()]
+    if key and key in frame:
+        duplicated = frame[key].duplicated(keep='last').to_numpy() & frame[key].notna().to_numpy()
+        if duplicated.any():
+            errors.append((f'{key}:duplicate', duplicated))
+    warnings = {issue: int(mask.sum()) for issue, mask in _check(schema.get('warn', {}), frame, hub_index, set())
+                if mask.any()}
+
+    bad = np.zeros(len(frame), dtype=bool)
+    for _, mask in errors:
+        bad |= mask
+    labels = np.full(int(bad.sum()), '', dtype=object)
+    for issue, mask in errors:
+        labels = labels + np.where(mask[bad], issue + ';', '').astype(object)
+    rejected = frame[bad].assign(quality_issues=[label.rstrip(';') for label in labels])
+
+    clean = frame
+    if bad.any():
+        clean = clean[~bad].reset_index(drop=True)
+    if coerced:
+        # What's left parses cleanly, so integer columns come back as integers
+        clean = clean.assign(**{column: pd.to_numeric(clean[column]) for column in coerced})
+    summary = {
+        'rows': len(frame),
+        'rejected': int(bad.sum()),
+        'issues': {issue: int(mask.sum()) for issue, mask in errors},
+        'warnings': warnings,
+        'seconds': round(time.perf_counter() - started, 4),
+    }
+    return clean, rejected, summary
+
+# ============================================================================
+# QUARANTINE & REPORT
+# ============================================================================
+
+class QualityLog:
+    """Validation totals per table and the quarantined rows behind them.
+
+    A full load replaces a table's history; ingest batches add to it. Quarantined rows are
+    stored as strings, exactly as received, with the rules they broke and when.
+    """
+
+    def __init__(self, limit=QUARANTINE_LIMIT):
+        self.limit = limit
+        self.tables = {}
+        self.quarantine = {}
+        self._lock = threading.Lock()
+
+    def record(self, table, rejected, summary, source):
+        """Add one validated batch; source is 'load' or 'ingest'."""
+        now = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        rejected = rejected.astype('str').assign(quality_source=source, quarantined_at=now)
+        with self._lock:
+            report = self.tables.get(table) if source != 'load' else None
+            if report is None:
+                report = {'rows_checked': 0, 'rows_rejected': 0, 'batches': 0, 'issues': {}, 'warnings': {}}
+                previous = None
+            else:
+                report = dict(report, issues=dict(report['issues']), warnings=dict(report['warnings']))
+                previous = self.quarantine.get(table)
+            report['rows_checked'] += summary['rows']
+            report['rows_rejected'] += summary['rejected']
+            report['batches'] += 1
+            for counts, new in ((report['issues'], summary['issues']), (report['warnings'], summary['warnings'])):
+                for issue, count in new.items():
+                    counts[issue] = counts.get(issue, 0) + count
+            report.update(last_checked_at=now, last_source=source, last_seconds=summary['seconds'])
+            if previous is not None and len(previous):
+                rejected = pd.concat([previous, rejected], ignore_index=True)
+            self.tables[table] = report
+            self.quarantine[table] = rejected.tail(self.limit).reset_index(drop=True)
+        return report
+
+    def report(self):
+        with self._lock:
+            return {table: dict(report, quarantined=len(self.quarantine.get(table, ())))
+                    for table, report in self.tables.items()}
+
+    def rows(self, table, issue=None, limit=100):
+        """Newest quarantined rows of a table, optionally only those that broke `issue`
+        (a full 'column:problem' name or just the column)."""
+        with self._lock:
+            frame = self.quarantine.get(table)
+        if frame is None or len(frame) == 0:
+            return []
+        if issue:
+            broken = frame['quality_issues'].astype(str).str.split(';')
+            frame = frame[broken.map(lambda issues: any(i == issue or i.split(':')[0] == issue for i in issues))]
+        frame = frame.iloc[::-1].head(limit)
+        return frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+
+    def export(self):
+        """Report state for publishing alongside a shared snapshot."""
+        with self._lock:
+            return {table: dict(report) for table, report in self.tables.items()}
+
+    def restore(self, tables, quarantine):
+        """Adopt another process's report and quarantined rows (see export)."""
+        with self._lock:
+            self.tables = {table: dict(report) for table, report in (tables or {}).items()}
+            self.quarantine = dict(quarantine)
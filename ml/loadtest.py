@@ -0,0 +1,434 @@
+"""
+Load & Soak Test Harness for the E-Vaccination Dashboard API
+Replays weighted mixes of admin-dashboard, hub-staff and forecast traffic against a running
+server with staged concurrency, and reports throughput, latency percentiles, error rates and
+server memory over time as JSON so runs against different serving modes can be compared.
+
+Examples:
+    python loadtest.py --profile mixed --stages 10:30,50:60,100:60 --output dev.json
+    python loadtest.py --serve "gunicorn -w 4 -b 127.0.0.1:5001 app:app" --output gunicorn.json
+    python loadtest.py --compare dev.json gunicorn.json
+"""
+
+import argparse
+import csv
+from datetime import date, timedelta
+import gzip
+import http.client
+import json
+import os
+import random
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BASE_DIR, 'backend')
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+
+PERCENTILES = (50, 90, 95, 99)
+
+# ============================================================================
+# TRAFFIC PROFILES
+# ============================================================================
+
+# Each request: (weight, name, method, path, body). path/body may be callables taking the
+# run context, so hub ids, citizen ids and dates vary between requests.
+def _hub(ctx):
+    return random.choice(ctx['hub_ids'])
+
+def _citizen(ctx):
+    return random.choice(ctx['citizen_ids']) if ctx['citizen_ids'] else 'UNKNOWN'
+
+def _future_day(ctx):
+    return (date.today() + timedelta(days=random.randint(1, 14))).isoformat()
+
+def _release(reservation):
+    return 'slots_release', 'POST', '/api/slots/release', {'reservation_id': reservation['reservation_id']}
+
+DASHBOARD = [
+    (10, 'overview', 'GET', '/api/overview', None),
+    (8, 'movements', 'GET', '/api/movements', None),
+    (4, 'movements_filtered', 'GET', lambda ctx: f'/api/movements?status=In_Transit&from_hub={_hub(ctx)}', None),
+    (6, 'coverage', 'GET', '/api/coverage', None),
+    (6, 'demographics', 'GET', '/api/demographics', None),
+    (8, 'insights', 'GET', '/api/insights', None),
+    (8, 'hubs', 'GET', '/api/hubs', None),
+    (5, 'wastage_stats', 'GET', '/api/wastage/stats', None),
+    (3, 'anomalies', 'GET', '/api/anomalies?limit=50', None),
+    (2, 'wastage_predict', 'POST', '/api/wastage/predict', {}),
+]
+
+STAFF = [
+    (10, 'hub_details', 'GET', lambda ctx: f'/api/hubs/{_hub(ctx)}', None),
+    (10, 'slots', 'GET', lambda ctx: f'/api/slots?hub_id={_hub(ctx)}&days=14', None),
+    (8, 'slots_reserve', 'POST', '/api/slots/reserve',
+     lambda ctx: {'hub_id': _hub(ctx), 'date': _future_day(ctx), 'citizen_id': _citizen(ctx)}),
+    (8, 'citizen_doses', 'GET', lambda ctx: f'/api/citizens/{_citizen(ctx)}/doses', None),
+    (4, 'hub_daily_vaccinations', 'GET', lambda ctx: f'/api/hubs/{_hub(ctx)}/vaccinations/daily', None),
+    (3, 'anomalies_hub', 'GET', lambda ctx: f'/api/anomalies?hub_id={_hub(ctx)}', None),
+]
+
+FORECAST = [
+    (6, 'forecast_7', 'POST', '/api/wastage/predict', lambda ctx: {'hub_id': _hub(ctx), 'horizon': 7}),
+    (3, 'forecast_30', 'POST', '/api/wastage/predict', lambda ctx: {'hub_id': _hub(ctx), 'horizon': 30}),
+    (2, 'forecast_90', 'POST', '/api/wastage/predict', lambda ctx: {'horizon': 90}),
+    (2, 'wastage_stats', 'GET', '/api/wastage/stats', None),
+]
+
+# Requests sent right after a successful one, built from its response data, so the run leaves
+# no state behind (each reservation is released, so hubs don't fill up over a soak)
+FOLLOW_UPS = {
+    'slots_reserve': _release,
+}
+
+PROFILES = {
+    'dashboard': DASHBOARD,
+    'staff': STAFF,
+    'forecast': FORECAST,
+    'mixed': [(w * 3, *rest) for w, *rest in DASHBOARD] + [(w * 2, *rest) for w, *rest in STAFF] + FORECAST,
+}
+
+# ============================================================================
+# CLIENT
+# ============================================================================
+
+class Client:
+    """One persistent HTTP/1.1 connection per virtual user, reopened after errors."""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        """Returns (status, response bytes); status is 0 for connection errors and timeouts."""
+        headers = {'Accept-Encoding': 'gzip', 'Connection': 'keep-alive'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.conn.request(method, path.replace(' ', '%20'), body=payload, headers=headers)
+            response = self.conn.getresponse()
+            content = response.read()
+            if response.getheader('Connection', '').lower() == 'close':
+                self.close()
+            return response.status, content
+        except (OSError, http.client.HTTPException):
+            self.close()
+            return 0, b''
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+def _json(content):
+    """Parse a (possibly gzipped) JSON response body."""
+    return json.loads(gzip.decompress(content) if content[:2] == b'\x1f\x8b' else content)
+
+def discover(base_url, timeout):
+    """Hub ids from the running API and a sample of citizen ids from the local CSV (if present)."""
+    status, content = Client(base_url, timeout).request('GET', '/api/hubs')
+    hub_ids = []
+    if status == 200:
+        try:
+            hub_ids = [hub['hub_id'] for hub in _json(content)['data']['hubs']]
+        except (ValueError, KeyError, OSError):
+            pass
+    citizen_ids = []
+    path = os.path.join(DATA_DIR, 'vaccination_records.csv')
+    if os.path.exists(path):
+        with open(path, newline='') as f:
+            for i, row in enumerate(csv.DictReader(f)):
+                citizen_ids.append(row['citizen_id'])
+                if i >= 5000:
+                    break
+    return {'hub_ids': hub_ids or ['HUB_001'], 'citizen_ids': citizen_ids}
+
+# ============================================================================
+# SERVER PROCESS & MEMORY SAMPLING
+# ============================================================================
+
+def _children(pid):
+    found = []
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                found += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    return found
+
+def process_tree(pid):
+    """pid plus all of its descendants (Linux /proc only)."""
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending += _children(current)
+    return tree
+
+def rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+class MemorySampler(threading.Thread):
+    """Records the RSS of the server process and each worker every `interval` seconds."""
+
+    def __init__(self, pid, interval, started):
+        super().__init__(name='memory-sampler', daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.started = started
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            processes = {pid: rss_kb(pid) for pid in process_tree(self.pid)}
+            processes = {str(pid): kb for pid, kb in processes.items() if kb is not None}
+            self.samples.append({
+                't': round(time.perf_counter() - self.started, 2),
+                'total_rss_mb': round(sum(processes.values()) / 1024, 1),
+                'processes_mb': {pid: round(kb / 1024, 1) for pid, kb in processes.items()},
+            })
+            self.stopped.wait(self.interval)
+
+def start_server(command, base_url, timeout=120):
+    """Launch the server command from the backend directory and wait until it answers /api."""
+    process = subprocess.Popen(shlex.split(command), cwd=BACKEND_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = Client(base_url, 5)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}')
+        status, _ = client.request('GET', '/api')
+        if status == 200:
+            client.close()
+            return process
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f'Server did not answer within {timeout}s')
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def summarize(results, seconds):
+    """results: list of (endpoint, status, latency_ms). Overall and per-endpoint statistics.
+    409s (e.g. a full hub) are expected under load, so they are reported as conflicts, not errors.
+    """
+    def stats(rows):
+        latencies = sorted(latency for _, _, latency in rows)
+        errors = sum(1 for _, status, _ in rows if status == 0 or status >= 500)
+        conflicts = sum(1 for _, status, _ in rows if status == 409)
+        codes = {}
+        for _, status, _ in rows:
+            codes[str(status)] = codes.get(str(status), 0) + 1
+        summary = {
+            'requests': len(rows),
+            'throughput_rps': round(len(rows) / seconds, 2) if seconds else 0.0,
+            'error_rate': round(errors / len(rows), 4) if rows else 0.0,
+            'conflict_rate': round(conflicts / len(rows), 4) if rows else 0.0,
+            'status_codes': codes,
+            'latency_ms': {f'p{pct}': round(percentile(latencies, pct), 2) if latencies else None
+                           for pct in PERCENTILES},
+        }
+        summary['latency_ms']['mean'] = round(sum(latencies) / len(latencies), 2) if latencies else None
+        summary['latency_ms']['max'] = round(latencies[-1], 2) if latencies else None
+        return summary
+
+    by_endpoint = {}
+    for row in results:
+        by_endpoint.setdefault(row[0], []).append(row)
+    return dict(stats(results), endpoints={name: stats(rows) for name, rows in sorted(by_endpoint.items())})
+
+class VirtualUser(threading.Thread):
+    def __init__(self, base_url, profile, ctx, think, timeout, sink):
+        super().__init__(daemon=True)
+        self.client = Client(base_url, timeout)
+        self.profile = profile
+        self.weights = [entry[0] for entry in profile]
+        self.ctx = ctx
+        self.think = think
+        self.sink = sink
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            _, name, method, path, body = random.choices(self.profile, weights=self.weights)[0]
+            path = path(self.ctx) if callable(path) else path
+            body = body(self.ctx) if callable(body) else body
+            status, content = self._send(name, method, path, body)
+            if status == 200 and name in FOLLOW_UPS:
+                try:
+                    follow_up = FOLLOW_UPS[name](_json(content)['data'])
+                except (ValueError, KeyError, TypeError, OSError):
+                    follow_up = None
+                if follow_up:
+                    self._send(*follow_up)
+            if self.think:
+                self.stopped.wait(random.expovariate(1 / self.think))
+        self.client.close()
+
+    def _send(self, name, method, path, body):
+        started = time.perf_counter()
+        status, content = self.client.request(method, path, body)
+        self.sink.append((name, status, (time.perf_counter() - started) * 1000, started))
+        return status, content
+
+def parse_stages(spec):
+    """'10:30,50:60' -> [(10 users, 30s), (50 users, 60s)]"""
+    stages = []
+    for part in spec.split(','):
+        users, seconds = part.split(':')
+        stages.append((int(users), float(seconds)))
+    return stages
+
+def run(args):
+    base_url = args.url.rstrip('/')
+    server = start_server(args.serve, base_url) if args.serve else None
+    pid = server.pid if server else args.server_pid
+    try:
+        ctx = discover(base_url, args.timeout)
+        profile = PROFILES[args.profile]
+        started = time.perf_counter()
+        sampler = MemorySampler(pid, args.sample_interval, started) if pid else None
+        if sampler:
+            sampler.start()
+
+        sink, users, stages = [], [], []
+        for concurrency, seconds in parse_stages(args.stages):
+            # Ramp: add or stop users to reach the stage's concurrency
+            while len(users) < concurrency:
+                user = VirtualUser(base_url, profile, ctx, args.think, args.timeout, sink)
+                user.start()
+                users.append(user)
+            while len(users) > concurrency:
+                users.pop().stopped.set()
+            stage_start = time.perf_counter()
+            print(f"⏱️  Stage {len(stages) + 1}: {concurrency} users for {seconds:.0f}s")
+            time.sleep(seconds)
+            stage_end = time.perf_counter()
+            rows = [(name, status, latency) for name, status, latency, at in list(sink)
+                    if stage_start <= at < stage_end]
+            summary = summarize(rows, stage_end - stage_start)
+            stages.append(dict({'users': concurrency, 'seconds': seconds}, **summary))
+            print(f"   {summary['throughput_rps']} req/s, p95 {summary['latency_ms']['p95']} ms, "
+                  f"errors {summary['error_rate'] * 100:.2f}%, conflicts {summary['conflict_rate'] * 100:.2f}%")
+
+        for user in users:
+            user.stopped.set()
+        for user in users:
+            user.join(args.timeout)
+        if sampler:
+            sampler.stopped.set()
+            sampler.join()
+
+        timeline = {}
+        for name, status, latency, at in sink:
+            second = int(at - started)
+            bucket = timeline.setdefault(second, [0, 0])
+            bucket[0] += 1
+            bucket[1] += status == 0 or status >= 500
+        return {
+            'label': args.label or args.serve or base_url,
+            'url': base_url,
+            'profile': args.profile,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'stages': stages,
+            'timeline': [{'t': second, 'requests': count, 'errors': errors}
+                         for second, (count, errors) in sorted(timeline.items())],
+            'memory': sampler.samples if sampler else [],
+        }
+    finally:
+        if server:
+            # Dev-server reloaders and pre-fork servers run the app in child processes
+            for child in process_tree(server.pid)[1:]:
+                try:
+                    os.kill(child, signal.SIGTERM)
+                except OSError:
+                    pass
+            server.terminate()
+            server.wait(10)
+
+# ============================================================================
+# COMPARISON
+# ============================================================================
+
+def _change(old, new):
+    if old in (None, 0) or new is None:
+        return '   n/a'
+    return f'{(new - old) / old * 100:+6.1f}%'
+
+def compare(paths):
+    reports = [json.load(open(path)) for path in paths]
+    base = reports[0]
+    print(f"📊 Baseline: {base['label']} ({paths[0]})")
+    for other, path in zip(reports[1:], paths[1:]):
+        print(f"\n🔁 {other['label']} ({path})")
+        print(f"   {'stage':<7}{'users':>6}{'req/s':>12}{'p50 ms':>18}{'p95 ms':>18}{'p99 ms':>18}{'errors':>10}{'409s':>10}")
+        for i, (a, b) in enumerate(zip(base['stages'], other['stages']), 1):
+            print(f"   {i:<7}{b['users']:>6}"
+                  f"{b['throughput_rps']:>8} {_change(a['throughput_rps'], b['throughput_rps'])}"
+                  + ''.join(f"{b['latency_ms'][p]!s:>10} {_change(a['latency_ms'][p], b['latency_ms'][p])}"
+                            for p in ('p50', 'p95', 'p99'))
+                  + f"{b['error_rate'] * 100:>9.2f}%{b.get('conflict_rate', 0.0) * 100:>9.2f}%")
+        peak = [max((s['total_rss_mb'] for s in report['memory']), default=None) for report in (base, other)]
+        if None not in peak:
+            print(f"   peak server memory: {peak[0]} MB -> {peak[1]} MB ({_change(peak[0], peak[1]).strip()})")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load/soak test the E-Vaccination Dashboard API')
+    parser.add_argument('--url', default='http://127.0.0.1:5001', help='Base URL of a running server')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='mixed')
+    parser.add_argument('--stages', default='5:20,20:40,50:40',
+                        help='Ramp as users:seconds pairs, e.g. 10:30,50:60 (use one long stage to soak)')
+    parser.add_argument('--think', type=float, default=0.0, help='Mean think time between requests per user (s)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout (s)')
+    parser.add_argument('--serve', help='Start this server command in ml/backend for the run, e.g. "python app.py"')
+    parser.add_argument('--server-pid', type=int, help='Sample memory of an already running server (and its workers)')
+    parser.add_argument('--sample-interval', type=float, default=2.0, help='Memory sampling interval (s)')
+    parser.add_argument('--label', help='Name of this run in reports (defaults to the server command or URL)')
+    parser.add_argument('--output', help='Write the JSON report here')
+    parser.add_argument('--compare', nargs='+', metavar='REPORT', help='Compare saved reports against the first one')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(args.compare)
+        return 0
+
+    print(f"🚀 Load testing {args.url} with the '{args.profile}' profile")
+    report = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report saved to {args.output}")
+    worst = max((stage['error_rate'] for stage in report['stages']), default=0.0)
+    return 1 if worst > 0.05 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())